@@ -0,0 +1,57 @@
+# La app de main.py contra la flota simulada, con un login de prueba, para bench/load.py.
+#
+#   BENCH_FLEET_PORT=8443 gunicorn -w 1 -b 127.0.0.1:8080 bench.app:app
+#   BENCH_FLEET_PORT=8443 gunicorn -w 1 -k aiohttp.GunicornWebWorker -b 127.0.0.1:8080 bench.app:serving
+#
+# GET /_bench/login deja una sesión válida (sin pasar por Google). Cada respuesta lleva
+# X-Bench-Service-Time: segundos que la vista tuvo el request, sin la espera en cola.
+
+import os
+import time
+# Primero: fija el entorno antes de que se importe checks
+import bench.stubs as stubs
+import bench.fleet as fleet
+from aiohttp import web
+from flask import g, jsonify, session
+import main
+import main_async
+
+stubs.install(
+    int(os.environ["BENCH_FLEET_PORT"]),
+    fleet.instancias(int(os.getenv("BENCH_INSTANCES", "100"))),
+    fleet.URL_CHECKS,
+)
+
+app = main.app
+
+
+@app.route("/_bench/login")
+def bench_login():
+    session["email"] = "bench@primary.com.ar"
+    return jsonify({"status": "ok"})
+
+
+@app.before_request
+def bench_started():
+    g.bench_started = time.perf_counter()
+
+
+@app.after_request
+def bench_service_time(response):
+    started = g.get("bench_started")
+    if started is not None:
+        response.headers["X-Bench-Service-Time"] = f"{time.perf_counter() - started:.6f}"
+    return response
+
+
+@web.middleware
+async def service_time(request, handler):
+    started = time.perf_counter()
+    response = await handler(request)
+    # Las rutas que pasan por Flask ya lo traen de after_request
+    response.headers.setdefault("X-Bench-Service-Time", f"{time.perf_counter() - started:.6f}")
+    return response
+
+
+# Modo async (main_async.py), con las mismas rutas de prueba
+serving = main_async.build(app, middlewares=[service_time])
@@ -0,0 +1,201 @@
+# Benchmark del motor de chequeos contra la flota simulada (bench/fleet.py).
+#
+#   python -m bench.checks_bench --sizes 10,100,1000 --latency-ms 30 --error-rate 0.01
+#
+# Para cada tamaño de flota corre cada chequeo (y la corrida combinada) en frío y en
+# caliente, y reporta tiempo total, p50/p99 de latencia por request, requests que
+# llegaron a la flota, pico de sockets abiertos y pico de memoria del proceso.
+# Las opciones que no reconoce se le pasan a la flota (--hang-rate, --sigma, ...).
+
+# Primero: fija el entorno antes de que se importe checks
+import bench.stubs as stubs
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+import bench.fleet as fleet
+
+CHECK_KEYS = ["admin", "nodes", "sessions", "matriz", "etrader", "webService", "accountReport", "disponibility"]
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de los chequeos contra una flota simulada")
+    parser.add_argument("--sizes", default="10,100,1000", help="cantidades de instancias, separadas por coma")
+    parser.add_argument("--checks", default=",".join(CHECK_KEYS), help="chequeos a medir, separados por coma")
+    parser.add_argument("--repeat", type=int, default=2, help="corridas por chequeo (la primera es en frío)")
+    parser.add_argument("--deadline", type=float, default=60, help="plazo de cada corrida, en segundos")
+    parser.add_argument("--max-inflight", type=int, help="GOVERNOR_MAX_INFLIGHT para la corrida")
+    parser.add_argument("--max-per-host", type=int, help="GOVERNOR_MAX_PER_HOST para la corrida")
+    parser.add_argument("--json", help="archivo donde guardar los resultados")
+    parser.add_argument("--verbose", action="store_true", help="muestra los logs de los chequeos")
+    return parser.parse_known_args(argv)
+
+
+def _sockets():
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+    count = 0
+    for fd in fds:
+        try:
+            count += os.readlink(f"/proc/self/fd/{fd}").startswith("socket:")
+        except OSError:
+            # Se cerró entre el listado y la lectura
+            pass
+    return count
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return None
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+async def _sample(peaks, stop):
+    # Pico de sockets y memoria mientras corre el chequeo
+    while not stop.is_set():
+        for name, value in (("sockets", _sockets()), ("rss_mb", _rss_mb())):
+            if value is not None:
+                peaks[name] = max(peaks.get(name, value), value)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.02)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _fleet_requests(session):
+    async with session.get("https://fleet.com.ar/_fleet/stats") as response:
+        return (await response.json())["requests"]
+
+
+async def _measure(key, budget):
+    import checks.deadline as deadline
+    import checks.scheduler as scheduler
+    import checks.tracing as tracing
+
+    run = tracing.start(f"bench {key}")
+    deadline.start(budget)
+    started = time.perf_counter()
+    fn = scheduler.JOBS[key][0]
+    # La corrida combinada fija su propio plazo (RUN_DEADLINE): se le pasa el del benchmark
+    result = await (fn(budget) if key == "disponibility" else fn())
+    wall = time.perf_counter() - started
+    tracing.finish(run)
+
+    attempts = [span["end"] - span["start"] for span in run["spans"] if span["name"].startswith(("GET ", "HEAD "))]
+    return result, wall, attempts
+
+
+async def _bench_size(size, keys, options, tables):
+    import checks.breaker as breaker
+    import checks.http_client as http_client
+    import checks.inventory as inventory
+    import checks.latency as latency
+    import checks.latest as latest
+    import checks.liveness as liveness
+    import checks.scheduler as scheduler
+
+    tables.data["instancias"] = fleet.instancias(size)
+    inventory.invalidate()
+    results = []
+
+    for key in keys:
+        # Cada chequeo arranca sin historia: pool, breaker, latencias y tier rápido en cero
+        await http_client.close_session()
+        for state in (breaker._hosts, latency._profiles, liveness._last_full):
+            state.clear()
+
+        for attempt in range(options.repeat):
+            session = http_client.get_session()
+            before_requests = await _fleet_requests(session)
+            base_sockets, base_rss = _sockets(), _rss_mb()
+            peaks, stop = {}, asyncio.Event()
+            sampler = asyncio.ensure_future(_sample(peaks, stop))
+
+            # Tarea propia: la traza y el plazo no se filtran a la siguiente medición
+            result, wall, attempts = await asyncio.ensure_future(_measure(key, options.deadline))
+            stop.set()
+            await sampler
+
+            rows, _ = latest.snapshot(scheduler.JOBS[key][1])
+            results.append({
+                "instances": size,
+                "check": key,
+                "run": "cold" if attempt == 0 else "warm",
+                "wall_s": round(wall, 3),
+                "requests": len(attempts),
+                "fleet_requests": await _fleet_requests(session) - before_requests,
+                "p50_ms": round(_percentile(attempts, 0.50) * 1000, 1) if attempts else None,
+                "p99_ms": round(_percentile(attempts, 0.99) * 1000, 1) if attempts else None,
+                "rows": len(rows),
+                "errors": sum(1 for row in rows if row["error"]),
+                "peak_sockets": peaks.get("sockets", 0) - (base_sockets or 0),
+                "peak_rss_mb": round(peaks.get("rss_mb", 0) - (base_rss or 0), 1),
+                "status": "ok" if isinstance(result, dict) else str(result),
+            })
+            _print_row(results[-1])
+    return results
+
+
+COLUMNS = ["instances", "check", "run", "wall_s", "requests", "fleet_requests", "p50_ms", "p99_ms",
+           "rows", "errors", "peak_sockets", "peak_rss_mb"]
+
+
+def _width(column):
+    return 13 if column == "check" else max(len(column), 8)
+
+
+def _print_row(row):
+    print("  ".join(f"{str(row[column]):>{_width(column)}}" for column in COLUMNS), flush=True)
+
+
+async def _main(options, fleet_args):
+    import checks.http_client as http_client
+
+    process, port = fleet.start(fleet_args)
+    try:
+        tables = stubs.install(port, [], fleet.URL_CHECKS)
+        keys = [key for key in options.checks.split(",") if key]
+        print("  ".join(f"{column:>{_width(column)}}" for column in COLUMNS))
+        results = []
+        for size in (int(value) for value in options.sizes.split(",")):
+            results += await _bench_size(size, keys, options, tables)
+        await http_client.close_session()
+        return results
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    options, fleet_args = _parse_args(argv)
+    if options.max_inflight:
+        os.environ["GOVERNOR_MAX_INFLIGHT"] = str(options.max_inflight)
+    if options.max_per_host:
+        os.environ["GOVERNOR_MAX_PER_HOST"] = str(options.max_per_host)
+
+    import checks.scheduler  # noqa: F401 (importa todos los chequeos y su logging)
+    if not options.verbose:
+        logging.getLogger("checks").setLevel(logging.WARNING)
+
+    results = asyncio.run(_main(options, fleet_args))
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
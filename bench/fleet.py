@@ -0,0 +1,168 @@
+# Flota simulada de brokers para benchmarks: un solo servidor TLS local que responde
+# como cualquier api-risk.{env}.{url}.com.ar y como los fronts de plataforma.
+#
+#   python -m bench.fleet --port 8443 --latency-ms 30 --sigma 0.6 --error-rate 0.01
+#
+# Imprime "READY <puerto>" cuando acepta conexiones. Los clientes resuelven todos los
+# hosts a 127.0.0.1:<puerto> (ver bench/stubs.py).
+
+import argparse
+import asyncio
+import os
+import random
+import ssl
+import subprocess
+import sys
+import tempfile
+from aiohttp import web
+
+# Entradas de url_checks que sirve la flota (mismas que espera cada chequeo)
+URL_CHECKS = [
+    {"type": "PLATFORM", "name": "ADMIN", "url": "admin"},
+    {"type": "PLATFORM", "name": "MATRIZ", "url": "matriz"},
+    {"type": "PLATFORM", "name": "ETRADER", "url": "etrader"},
+    {"type": "NODES", "name": "NODES", "url": "/api/nodes"},
+    {"type": "WEBSERVICE", "name": "WEBSERVICE", "url": "/api/ws/status"},
+    {"type": "ACCOUNT", "name": "ACCOUNT", "url": "/api/account/report/"},
+] + [
+    {"type": "SESSION", "name": name, "url": f"/api/sessions/{name.lower()}"}
+    for name in ("PBCP", "ROFX", "MATRIZ", "BYMA_OR", "BYMA_MDP", "BYMA_CON")
+]
+
+NODE_IDS = (
+    "risk-calculator-0", "risk-0", "fix-0", "markets-connector-mtr-0", "api-risk-0",
+    "markets-connector-mfci-0", "markets-connector-byma-0",
+)
+
+
+def instancias(count, url="fleet"):
+    # Tabla `instancias` de la flota: e0..e{count-1}, todas con todas las sesiones
+    return [
+        {
+            "name": f"Broker {i:04d}",
+            "env": f"e{i}",
+            "url": url,
+            "token": f"token-{i}",
+            "sessions": "PRMBF",
+            "testacc": str(1000 + i),
+            "status": 1,
+        }
+        for i in range(count)
+    ]
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Flota simulada de brokers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=20, help="mediana de la latencia por request")
+    parser.add_argument("--sigma", type=float, default=0.5, help="dispersión log-normal de la latencia")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de requests que responden 500")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fracción de requests que nunca responden")
+    parser.add_argument("--down-rate", type=float, default=0.0, help="fracción de instancias caídas (503 siempre)")
+    parser.add_argument("--filler-nodes", type=int, default=50, help="nodos extra en /nodes antes de los requeridos")
+    parser.add_argument("--page-kb", type=int, default=64, help="tamaño de los fronts de plataforma")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def _instance_env(host):
+    # admin.e12.fleet.com.ar / api-risk.e12.fleet.com.ar -> e12
+    parts = host.split(":")[0].split(".")
+    return parts[1] if len(parts) > 2 else ""
+
+
+def build_app(options):
+    rng = random.Random(options.seed)
+    page = b"<html><body>" + b"x" * (options.page_kb * 1024) + b"</body></html>"
+    filler = [{"id": f"worker-{i}", "status": "UP"} for i in range(options.filler_nodes)]
+    nodes = {"status": "OK", "response": filler + [{"id": node_id, "status": "UP"} for node_id in NODE_IDS]}
+    stats = {"requests": 0, "inflight": 0, "max_inflight": 0}
+
+    def down(env):
+        return random.Random(f"{options.seed}:{env}").random() < options.down_rate
+
+    async def handle(request):
+        stats["requests"] += 1
+        stats["inflight"] += 1
+        stats["max_inflight"] = max(stats["max_inflight"], stats["inflight"])
+        try:
+            return await _respond(request)
+        finally:
+            stats["inflight"] -= 1
+
+    async def _respond(request):
+        host = request.host
+        if down(_instance_env(host)):
+            return web.Response(status=503, text="down")
+        if rng.random() < options.hang_rate:
+            await asyncio.sleep(3600)
+        await asyncio.sleep(rng.lognormvariate(0, options.sigma) * options.latency_ms / 1000)
+        if rng.random() < options.error_rate:
+            return web.Response(status=500, text="error")
+
+        if not host.startswith("api-risk."):
+            return web.Response(body=page, content_type="text/html")
+        path = request.path
+        if path.endswith("/nodes"):
+            return web.json_response(nodes)
+        if path.startswith("/api/sessions/"):
+            return web.json_response([{"session": path.rsplit("/", 1)[1], "loged": True}])
+        if path.endswith("/ws/status"):
+            return web.Response(text="status: CONNECTED")
+        if path.startswith("/api/account/report/"):
+            return web.json_response(True)
+        return web.Response(status=404)
+
+    async def fleet_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get("/_fleet/stats", fleet_stats)
+    app.router.add_route("*", "/{tail:.*}", handle)
+    return app
+
+
+def self_signed(directory):
+    cert = os.path.join(directory, "fleet.pem")
+    key = os.path.join(directory, "fleet.key")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2",
+         "-subj", "/CN=*.com.ar", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+async def serve(options):
+    with tempfile.TemporaryDirectory() as directory:
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(*self_signed(directory))
+        runner = web.AppRunner(build_app(options), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, options.host, options.port, ssl_context=context, backlog=4096)
+        await site.start()
+        port = runner.addresses[0][1]
+        print(f"READY {port}", flush=True)
+        await asyncio.Event().wait()
+
+
+def start(args=()):
+    # Levanta la flota en otro proceso (así sus sockets no se cuentan como del cliente)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "bench.fleet", *args],
+        stdout=subprocess.PIPE, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    line = process.stdout.readline()
+    if not line.startswith("READY"):
+        process.kill()
+        raise RuntimeError(f"La flota no arrancó: {line!r}")
+    return process, int(line.split()[1])
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(_parse_args()))
+    except KeyboardInterrupt:
+        pass
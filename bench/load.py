@@ -0,0 +1,184 @@
+# Prueba de carga HTTP de las rutas de main.py contra la flota simulada (bench/fleet.py).
+#
+#   python -m bench.load --clients 20 --duration 30 --routes "/check-admin,/check-disponibility?fresh=1,/"
+#   python -m bench.load --server "gunicorn -w 1 -k gthread --threads 8 -b {host}:{port} bench.app:app"
+#   python -m bench.load --server "gunicorn -w 1 -k aiohttp.GunicornWebWorker -b {host}:{port} bench.app:serving"
+#
+# Levanta la flota y el servidor (por defecto como en render.yaml), loguea a cada cliente
+# con /_bench/login y reparte los requests entre las rutas. Reporta por ruta latencia
+# (p50/p95/p99/máx), throughput, errores y cola: latencia del cliente menos el tiempo que
+# la vista tuvo el request (X-Bench-Service-Time).
+# Las opciones que no reconoce se le pasan a la flota (--latency-ms, --hang-rate, ...).
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import shlex
+import socket
+import subprocess
+import tempfile
+import time
+import aiohttp
+import bench.fleet as fleet
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SERVER = "gunicorn -w 1 -b {host}:{port} bench.app:app"
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de las rutas Flask")
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="comando del servidor; {host} y {port} se reemplazan")
+    parser.add_argument("--instances", type=int, default=100, help="instancias de la flota")
+    parser.add_argument("--clients", type=int, default=10, help="clientes concurrentes")
+    parser.add_argument("--duration", type=float, default=30, help="segundos de carga")
+    parser.add_argument("--routes", default="/check-admin,/check-disponibility?fresh=1,/", help="rutas separadas por coma")
+    parser.add_argument("--timeout", type=float, default=120, help="timeout de cada request")
+    parser.add_argument("--scheduler", action="store_true", help="deja el scheduler de la app prendido")
+    parser.add_argument("--json", help="archivo donde guardar los resultados")
+    return parser.parse_known_args(argv)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(options, fleet_port, workdir):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        BENCH_FLEET_PORT=str(fleet_port),
+        BENCH_INSTANCES=str(options.instances),
+        SCHEDULER_ENABLED="1" if options.scheduler else "0",
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+    )
+    command = shlex.split(options.server.format(host="127.0.0.1", port=port))
+    # Directorio propio: Flask-Session guarda las sesiones en ./flask_session
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def _wait_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"El servidor terminó con código {process.returncode}")
+            try:
+                async with session.get(f"{base_url}/_bench/login") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+async def _client(index, base_url, routes, stop_at, timeout, samples):
+    jar = aiohttp.CookieJar(unsafe=True)
+    async with aiohttp.ClientSession(cookie_jar=jar, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        async with session.get(f"{base_url}/_bench/login") as response:
+            await response.read()
+        turn = index
+        while time.monotonic() < stop_at:
+            route = routes[turn % len(routes)]
+            turn += 1
+            started = time.monotonic()
+            status, service = None, None
+            try:
+                async with session.get(f"{base_url}{route}", allow_redirects=False) as response:
+                    await response.read()
+                    status = response.status
+                    service = response.headers.get("X-Bench-Service-Time")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            samples.append({
+                "route": route,
+                "started": started,
+                "latency": time.monotonic() - started,
+                "status": status,
+                "service": float(service) if service else None,
+            })
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def _ms(value):
+    return round(value * 1000, 1) if value is not None else None
+
+
+def summarize(samples, duration):
+    report = []
+    for route in sorted({sample["route"] for sample in samples}):
+        rows = [sample for sample in samples if sample["route"] == route]
+        latencies = [row["latency"] for row in rows]
+        queued = [row["latency"] - row["service"] for row in rows if row["service"] is not None]
+        report.append({
+            "route": route,
+            "requests": len(rows),
+            "rps": round(len(rows) / duration, 2),
+            "errors": sum(1 for row in rows if not isinstance(row["status"], int) or row["status"] >= 400),
+            "p50_ms": _ms(_percentile(latencies, 0.50)),
+            "p95_ms": _ms(_percentile(latencies, 0.95)),
+            "p99_ms": _ms(_percentile(latencies, 0.99)),
+            "max_ms": _ms(max(latencies)),
+            "queue_p50_ms": _ms(_percentile(queued, 0.50)),
+            "queue_p99_ms": _ms(_percentile(queued, 0.99)),
+        })
+    return report
+
+
+COLUMNS = ["route", "requests", "rps", "errors", "p50_ms", "p95_ms", "p99_ms", "max_ms", "queue_p50_ms", "queue_p99_ms"]
+
+
+def _print(report):
+    widths = {column: max([len(column)] + [len(str(row[column])) for row in report]) for column in COLUMNS}
+    print("  ".join(f"{column:>{widths[column]}}" for column in COLUMNS))
+    for row in report:
+        print("  ".join(f"{str(row[column]):>{widths[column]}}" for column in COLUMNS))
+
+
+async def _main(options, fleet_args):
+    routes = [route.strip() for route in options.routes.split(",") if route.strip()]
+    fleet_process, fleet_port = fleet.start(fleet_args)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            server, base_url = _start_server(options, fleet_port, workdir)
+            try:
+                await _wait_ready(base_url, server)
+                samples = []
+                started = time.monotonic()
+                stop_at = started + options.duration
+                await asyncio.gather(*(
+                    _client(i, base_url, routes, stop_at, options.timeout, samples)
+                    for i in range(options.clients)
+                ))
+                return summarize(samples, time.monotonic() - started)
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        fleet_process.terminate()
+        fleet_process.wait()
+
+
+def main(argv=None):
+    options, fleet_args = _parse_args(argv)
+    report = asyncio.run(_main(options, fleet_args))
+    print(f"servidor: {options.server}  clientes: {options.clients}  instancias: {options.instances}")
+    _print(report)
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump({"server": options.server, "clients": options.clients, "instances": options.instances, "routes": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
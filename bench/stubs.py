@@ -0,0 +1,99 @@
+# Reemplazos en proceso para correr los chequeos contra la flota simulada (bench/fleet.py):
+# tablas de Supabase en memoria, DNS que resuelve todo a la flota y TLS sin verificación.
+# Tiene que importarse antes que `checks`, que lee la configuración del entorno al importar.
+
+import os
+import socket
+import ssl
+import threading
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+os.environ.setdefault("SCHEDULER_ENABLED", "0")
+os.environ.setdefault("HISTORY_ENABLED", "0")
+# Cada medición es una corrida real, no el resultado recién cacheado de la anterior
+os.environ.setdefault("COALESCE_WINDOW", "0")
+# La flota atiende a toda hora: el calendario de mercado no debe vaciar el chequeo de sesiones
+os.environ.setdefault("MARKET_CALENDAR_ENABLED", "0")
+
+
+class _Query:
+    def __init__(self, tables, name):
+        self.tables = tables
+        self.name = name
+        self.filters = []
+        self.rows = None
+
+    def select(self, *columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def insert(self, rows):
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def execute(self):
+        with self.tables.lock:
+            table = self.tables.data.setdefault(self.name, [])
+            if self.rows is not None:
+                table.extend(self.rows)
+                return _Result(self.rows)
+            return _Result([
+                dict(row) for row in table
+                if all(row.get(column) == value for column, value in self.filters)
+            ])
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeSupabase:
+    # Lo mínimo del cliente de supabase-py que usan checks/inventory.py y checks/db.py
+    def __init__(self, data):
+        self.lock = threading.Lock()
+        self.data = data
+
+    def table(self, name):
+        return _Query(self, name)
+
+
+# Dónde atiende la flota; install() lo actualiza
+FLEET = {"host": "127.0.0.1", "port": None}
+
+
+class FleetResolver(AbstractResolver):
+    # Todos los hosts van a la flota local, en su puerto
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        return [{"hostname": host, "host": FLEET["host"], "port": FLEET["port"], "family": socket.AF_INET, "proto": 0, "flags": 0}]
+
+    async def close(self):
+        pass
+
+
+def install(port, instancias, url_checks):
+    import checks.db as db
+    import checks.http_client as http_client
+
+    FLEET["port"] = port
+    tables = FakeSupabase({"instancias": list(instancias), "url_checks": list(url_checks), "checks_logs": []})
+    db._state["client"] = tables
+
+    # La flota usa un certificado autofirmado
+    http_client.ssl_context.check_hostname = False
+    http_client.ssl_context.verify_mode = ssl.CERT_NONE
+
+    original = aiohttp.TCPConnector.__init__
+
+    def init(self, *args, **kwargs):
+        kwargs["resolver"] = FleetResolver()
+        original(self, *args, **kwargs)
+
+    if not getattr(aiohttp.TCPConnector, "_bench_patched", False):
+        aiohttp.TCPConnector.__init__ = init
+        aiohttp.TCPConnector._bench_patched = True
+    return tables
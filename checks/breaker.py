@@ -0,0 +1,66 @@
+import os
+import time
+
+# Circuit breaker por host, compartido por todos los chequeos
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "60"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_hosts = {}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host):
+        super().__init__(f"Circuito abierto para {host}")
+        self.host = host
+
+
+def _state(host):
+    state = _hosts.get(host)
+    if state is None:
+        state = _hosts[host] = {"state": CLOSED, "failures": 0, "opened_at": None}
+    return state
+
+
+def before(host):
+    # Levanta CircuitOpenError si el host no debe recibir el probe. Devuelve True si este
+    # es el probe de prueba tras el cooldown
+    state = _state(host)
+    if state["state"] == OPEN:
+        if time.monotonic() - state["opened_at"] < BREAKER_COOLDOWN:
+            raise CircuitOpenError(host)
+        # Pasó el cooldown: un único probe de prueba decide si se reabre
+        state["state"] = HALF_OPEN
+        return True
+    if state["state"] == HALF_OPEN:
+        raise CircuitOpenError(host)
+    return False
+
+
+def success(host):
+    state = _state(host)
+    state["state"] = CLOSED
+    state["failures"] = 0
+
+
+def failure(host):
+    state = _state(host)
+    state["failures"] += 1
+    if state["state"] == HALF_OPEN or state["failures"] >= BREAKER_THRESHOLD:
+        state["state"] = OPEN
+        state["opened_at"] = time.monotonic()
+
+
+def release(host):
+    # El probe de prueba terminó sin veredicto (p. ej. timeout): se vuelve a probar luego
+    state = _state(host)
+    if state["state"] == HALF_OPEN:
+        state["state"] = OPEN
+        state["opened_at"] = time.monotonic() - BREAKER_COOLDOWN
+
+
+def states():
+    return {host: {"state": s["state"], "failures": s["failures"]} for host, s in _hosts.items()}
@@ -1,43 +1,33 @@
-import aiohttp
 import asyncio
 from datetime import datetime
-from supabase import create_client, Client
-import ssl
-import os
+from functools import partial
+import checks.breaker as breaker
+import checks.deadline as deadline
+import checks.inventory as inventory
+import checks.latency as latency
+import checks.probe as probe
+import checks.http_client as http_client
+import checks.planner as planner
 
-# SSL seguro y compatible con Replit
-ssl_context = ssl.create_default_context()
-if hasattr(ssl, "OP_LEGACY_SERVER_CONNECT"):
-    ssl_context.options |= ssl.OP_LEGACY_SERVER_CONNECT
+CHECK_NAME = "Check Account Report"
 
-# Variables de entorno
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-assert SUPABASE_URL is not None, "Falta SUPABASE_URL"
-assert SUPABASE_KEY is not None, "Falta SUPABASE_KEY"
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# Obtener datos de Supabase
-def get_db_data():
-    envs_resp = supabase.table("instancias").select("*").eq("status", 1).execute()
-    urls_resp = supabase.table("url_checks").select("url").eq("name", "ACCOUNT").execute()
-
-    envs = envs_resp.data
-    urls = urls_resp.data
+# Armar endpoints a partir del inventario
+async def get_db_data():
+    envs = await inventory.get_instancias()
+    urls = await inventory.get_url_checks(name="ACCOUNT")
 
     if not envs or not urls:
-        raise Exception("No se encontraron datos en instancias o url_checks.")
+        raise planner.PlanError("No se encontraron datos en instancias o url_checks.")
 
-    url_base = urls[0]["url"].strip()  # Usamos solo una entrada
+    url_base = urls[0]["url"]  # Usamos solo una entrada
 
     combined = []
     for env in envs:
         combined.append({
-            "instance": env["name"].strip(),
-            "token": env["token"].strip(),
-            "endpoint": f"https://api-risk.{env['env'].strip()}.{env['url'].strip()}.com.ar{url_base}{env['testacc'].strip()}"
+            "instance": env["name"],
+            "token": env["token"],
+            "endpoint": f"https://api-risk.{env['env']}.{env['url']}.com.ar{url_base}{env['testacc']}"
         })
 
     return combined
@@ -46,13 +36,17 @@ def get_db_data():
 async def check_url(session, url, token, timeout):
     headers = {'Authorization': f'Basic {token}'}
     try:
-        async with session.get(url, headers=headers, timeout=timeout, ssl=ssl_context) as response:
+        async with probe.get(session, url, headers=headers, timeout=timeout) as response:
             if response.status == 200:
                 data = await response.json()
                 return ('Cuenta OK', 0) if data is True else ('Error en la cuenta', 1)
             else:
                 return f'Error HTTP {response.status}', 1
+    except breaker.CircuitOpenError as e:
+        return str(e), 1
     except asyncio.TimeoutError:
+        if deadline.expired():
+            return deadline.PENDING, 0
         return 'Timeout en la solicitud', 0
     except Exception as e:
         return f"Error: {str(e)}", 1
@@ -60,43 +54,48 @@ async def check_url(session, url, token, timeout):
 # Intenta varias veces
 async def check_with_retries(session, url, token, timeout, retries=3, backoff=0.5):
     for attempt in range(retries):
-        result, error = await check_url(session, url, token, timeout)
+        if deadline.expired():
+            return deadline.PENDING, 0
+        result, error = await check_url(session, url, token, deadline.timeout(latency.timeout(url, cold=timeout)))
         if result:
             return result, error
-        if attempt < retries - 1:
-            await asyncio.sleep(backoff * (2 ** attempt))
+        if attempt < retries - 1 and not await deadline.backoff(backoff * (2 ** attempt)):
+            return deadline.PENDING, 0
     return "Error luego de intentar 3 veces", 1
 
-# Función principal
-async def run_check():
-    check_name = "Check Account Report"
+# Arma la fila de log de una instancia
+async def check_instance(session, row, timeout, date):
+    result, error = await check_with_retries(session, row["endpoint"], row["token"], timeout)
+    return {
+        "check_name": CHECK_NAME,
+        "instance": row["instance"],
+        "date": date,
+        "output": result,
+        "error": error
+    }
+
+# Arma los probes del chequeo
+async def plan():
     date = datetime.now().isoformat()
-    all_logs = []
 
-    loop = asyncio.get_running_loop()
-    rows = await loop.run_in_executor(None, get_db_data)
+    rows = await get_db_data()
 
-    timeout_mapping = {'Inviu': 40}
+    # Timeout en frío; con historia, cada endpoint usa el que aprendió (ver checks/latency.py)
+    timeout = 10
 
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for row in rows:
-            timeout = timeout_mapping.get(row["instance"], 10)
-            tasks.append(check_with_retries(session, row["endpoint"], row["token"], timeout))
+    session = http_client.get_session()
+    probes = []
+    for row in rows:
+        probes.append(planner.Probe(
+            CHECK_NAME, row["instance"], (row["endpoint"],),
+            partial(check_instance, session, row, timeout, date),
+            variant=(row["token"],)
+        ))
+    return probes
 
-        results = await asyncio.gather(*tasks)
-
-        for (result, error), row in zip(results, rows):
-            all_logs.append({
-                "check_name": check_name,
-                "instance": row["instance"],
-                "date": date,
-                "output": result,
-                "error": error
-            })
-
-    supabase.table("checks_logs").insert(all_logs).execute()
-    return {"inserted_logs": len(all_logs), "status": "ok"}
+# Función principal
+async def run_check():
+    return await planner.run(plan)
 
 # Ejecutar si es principal
 if __name__ == "__main__":
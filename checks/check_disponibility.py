@@ -1,41 +1,107 @@
 # checks/check_disponibility.py
 
 import asyncio
-import checks.check_admin as check_admin
-import checks.check_nodes as check_nodes
-import checks.check_sessions as check_sessions
-import checks.check_matriz as check_matriz
-import checks.check_etrader as check_etrader
-import checks.check_webService as check_webService
-import checks.check_accountReport as check_accountReport
+import os
+import checks.deadline as deadline
+import checks.latest as latest
+import checks.planner as planner
+import checks.runner as runner
+import checks.tracing as tracing
 import logging
 
 # Configuración básica de logging (opcional)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def run_check():
-    checks = {
-        "admin": check_admin.run_check(),
-        "nodes": check_nodes.run_check(),
-        "sessions": check_sessions.run_check(),
-        "matriz": check_matriz.run_check(),
-        "etrader": check_etrader.run_check(),
-        "webService": check_webService.run_check(),
-        "accountReport": check_accountReport.run_check(),
-    }
+# Plazo total de la corrida combinada, en segundos
+RUN_DEADLINE = float(os.getenv("RUN_DEADLINE", "60"))
+DEADLINE_GRACE = float(os.getenv("DEADLINE_GRACE", "2"))
 
-    logger.info("Iniciando ejecución paralela de chequeos de disponibilidad...")
+async def _plan(name):
+    with tracing.span(f"plan {name}"):
+        return await runner.CHECKS[name].plan()
 
-    results = await asyncio.gather(*checks.values(), return_exceptions=True)
+
+async def _plan_all(names):
+    # El armado (inventario en Supabase) también entra en el plazo; si no termina a tiempo,
+    # ningún chequeo queda armado (None)
+    try:
+        async with asyncio.timeout(deadline.remaining()):
+            planes = await asyncio.gather(*(_plan(name) for name in names), return_exceptions=True)
+    except TimeoutError:
+        return dict.fromkeys(names)
+    return dict(zip(names, planes))
+
+
+async def _run_planned(own, limit):
+    # Todos los probes de los chequeos propios en una sola tanda, ordenada por el planner
+    loop = asyncio.get_running_loop()
+    planes = await _plan_all(list(own))
+    probes = []
+    for name, plan in planes.items():
+        if plan is None:
+            logger.warning(f"El check '{name}' no terminó de armarse dentro del plazo")
+            runner.finish(name, own[name], {"status": "pending/timeout"})
+        elif isinstance(plan, planner.PlanError):
+            runner.finish(name, own[name], ({"error": str(plan)}, 500))
+        elif isinstance(plan, Exception):
+            logger.error(f"Error en el check '{name}': {str(plan)}")
+            runner.finish(name, own[name], {"error": str(plan)})
+        else:
+            probes += plan
+
+    # Los probes respetan el plazo solos; el margen cubre el armado de las filas
+    rows = await planner.execute(probes, timeout=max(0, limit - loop.time()))
+    latest.record(rows)
+
+    por_check = {}
+    for row in rows:
+        por_check.setdefault(row["check_name"], []).append(row)
+    for name, plan in planes.items():
+        if plan is not None and not isinstance(plan, Exception):
+            check_name = runner.CHECKS[name].CHECK_NAME
+            runner.finish(name, own[name], planner.summary(por_check.get(check_name, [])))
+
+
+async def run_check(budget=None):
+    budget = RUN_DEADLINE if budget is None else budget
+    loop = asyncio.get_running_loop()
+    limit = loop.time() + budget + DEADLINE_GRACE
+
+    # Los chequeos que ya están corriendo (o recién terminaron) se comparten; el resto
+    # se planifica junto
+    claims = {name: runner.claim(name) for name in runner.CHECKS}
+    own = {name: future for name, (future, owner) in claims.items() if owner}
+
+    logger.info(f"Iniciando ejecución de chequeos de disponibilidad (plazo {budget}s, {len(own)} propios)...")
+
+    token = deadline.start(budget)
+    try:
+        if own:
+            await _run_planned(own, limit)
+    except BaseException as e:
+        for future in own.values():
+            runner.fail(future, e)
+        raise
+    finally:
+        deadline.reset(token)
+
+    shared = [future for name, (future, owner) in claims.items() if not owner]
+    if shared:
+        await asyncio.wait(shared, timeout=max(0, limit - loop.time()))
 
     response = {}
-    for name, result in zip(checks.keys(), results):
-        if isinstance(result, Exception):
-            logger.error(f"Error en el check '{name}': {str(result)}")
-            response[name] = {"error": str(result)}
+    for name, (future, _) in claims.items():
+        if not future.done():
+            logger.warning(f"El check '{name}' no terminó dentro del plazo")
+            response[name] = {"status": "pending/timeout"}
+        elif future.cancelled():
+            response[name] = {"status": "pending/timeout"}
+        elif future.exception() is not None:
+            logger.error(f"Error en el check '{name}': {str(future.exception())}")
+            response[name] = {"error": str(future.exception())}
         else:
-            response[name] = result
+            response[name] = future.result()
 
     logger.info("Finalizó ejecución de todos los chequeos.")
     return response
@@ -1,107 +1,59 @@
-import aiohttp
-import asyncio
 from datetime import datetime
-from supabase import create_client, Client
-import ssl
-import os
+from functools import partial
+import checks.inventory as inventory
+import checks.http_client as http_client
+import checks.planner as planner
+import checks.fronts as fronts
 
-# Configuración SSL
-ssl_context = ssl.create_default_context()
+CHECK_NAME = "Check Matriz"
 
-# Leer credenciales desde variables de entorno
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-assert SUPABASE_URL is not None, "Falta SUPABASE_URL"
-assert SUPABASE_KEY is not None, "Falta SUPABASE_KEY"
-
-# Cliente Supabase
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# Función para chequear una URL con retry
-async def check_url_async(session, url, retries=3, backoff_factor=0.3):
-    for attempt in range(retries):
-        try:
-            async with session.get(url, timeout=30) as response:
-                response.raise_for_status()
-                return True, url
-        except (aiohttp.ClientConnectionError, aiohttp.ClientResponseError):
-            if attempt < retries - 1:
-                await asyncio.sleep(backoff_factor * (2 ** attempt))
-        except asyncio.TimeoutError:
-            return False, url
-    return False, url
-
-# Función principal
-async def run_check():
+# Arma los probes del chequeo
+async def plan():
     # Obtener URL base
-    base_url_data = (
-        supabase.table("url_checks")
-        .select("url")
-        .eq("name", "MATRIZ")
-        .eq("type", "PLATFORM")
-        .limit(1)
-        .execute()
-    )
+    base_url_data = await inventory.get_url_checks(type="PLATFORM", name="MATRIZ")
 
-    if not base_url_data.data:
-        return {"error": "No se pudo obtener la URL base"}, 500
+    if not base_url_data:
+        raise planner.PlanError("No se pudo obtener la URL base")
 
-    base_url = base_url_data.data[0]["url"].strip()
+    base_url = base_url_data[0]["url"]
 
     # Obtener entornos activos
-    envs_data = (
-        supabase.table("instancias")
-        .select("env, url, name, sessions")
-        .eq("status", 1)
-        .execute()
-    )
+    envs_data = await inventory.get_instancias()
 
-    if not envs_data.data:
-        return {"error": "No se obtuvieron entornos"}, 500
+    if not envs_data:
+        raise planner.PlanError("No se obtuvieron entornos")
 
     # Separar por presencia de "M" en sessions
-    envs_con_m = [row for row in envs_data.data if row.get("sessions") and "M" in row["sessions"]]
-    envs_sin_m = [row for row in envs_data.data if not row.get("sessions") or "M" not in row["sessions"]]
+    envs_con_m = [row for row in envs_data if row.get("sessions") and "M" in row["sessions"]]
+    envs_sin_m = [row for row in envs_data if not row.get("sessions") or "M" not in row["sessions"]]
 
-    check_name = "Check Matriz"
     date = datetime.now().isoformat()
-    all_logs = []
-
-    # Chequeo real para los que tienen "M"
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-        tasks = []
-        for row in envs_con_m:
-            env = row["env"].strip()
-            url = row["url"].strip()
-            full_url = f"https://{base_url}.{env}.{url}.com.ar"
-            tasks.append(check_url_async(session, full_url))
+    probes = []
 
-        results = await asyncio.gather(*tasks)
-
-        for (success, checked_url), row in zip(results, envs_con_m):
-            name = row["name"].strip()
-            output = "Matriz OK" if success else checked_url
-            error = 0 if success else 1
-            all_logs.append({
-                "check_name": check_name,
-                "instance": name,
-                "date": date,
-                "output": output,
-                "error": error
-            })
-
-    # Para los que no tienen "M"
+    # Los que no tienen "M" no se chequean: se informan de entrada
     for row in envs_sin_m:
-        name = row["name"].strip()
-        all_logs.append({
-            "check_name": check_name,
-            "instance": name,
+        probes.append(planner.resolved({
+            "check_name": CHECK_NAME,
+            "instance": row["name"],
             "date": date,
             "output": "Matriz OK",
             "error": 0
-        })
+        }))
+
+    # Chequeo real para los que tienen "M"
+    session = http_client.get_session()
+    for row in envs_con_m:
+        env = row["env"]
+        url = row["url"]
+        full_url = f"https://{base_url}.{env}.{url}.com.ar"
+        probes.append(planner.Probe(
+            CHECK_NAME, row["name"], (full_url,),
+            partial(fronts.check_instance, session, CHECK_NAME, "Matriz OK", full_url, row["name"], date)
+        ))
+    return probes
 
-    # Insertar en Supabase
-    supabase.table("checks_logs").insert(all_logs).execute()
-    return {"inserted_logs": len(all_logs), "status": "ok"}
+
+# Función principal
+async def run_check():
+    return await planner.run(plan)
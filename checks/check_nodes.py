@@ -1,144 +1,243 @@
 import aiohttp
 import asyncio
+import codecs
+import json
+import logging
+import re
+import time
 from datetime import datetime
-import ssl
-from supabase import create_client, Client
-import os
-from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+import checks.breaker as breaker
+import checks.deadline as deadline
+import checks.inventory as inventory
+import checks.latency as latency
+import checks.probe as probe
+import checks.http_client as http_client
+import checks.planner as planner
 
-ssl_context = ssl.create_default_context()
+CHECK_NAME = "Check Nodes"
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-assert SUPABASE_URL is not None, "Falta supabase_url"
-assert SUPABASE_KEY is not None, "Falta supabase_key"
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-
-def fetch_envs():
-    response = supabase.table("instancias") \
-        .select("env, url, name, token, sessions") \
-        .eq("status", 1) \
-        .execute()
-    return response.data
-
-
-def fetch_endpoints():
-    response = supabase.table("url_checks") \
-        .select("url") \
-        .eq("type", "NODES") \
-        .execute()
-    return response.data
-
-
-def log_to_db_sync(logs):
-    payload = [{
-        "check_name": check_name,
-        "instance": instance,
-        "date": date,
-        "output": output,
-        "error": error
-    } for (check_name, instance, date, output, error) in logs]
-    supabase.table("checks_logs").insert(payload).execute()
+logger = logging.getLogger(__name__)
 
 
 async def check_nodes_with_retry(session, env, base_url, endpoint_url, token, sessions, instance, retries=3, backoff_factor=0.5):
     nodes_url = f'https://api-risk.{env}.{base_url}.com.ar{endpoint_url}'
     headers = {'Authorization': f'Basic {token}'}
-    timeout = 40 if instance == 'Inviu' else 10
     error_message = None
 
     for attempt in range(retries):
+        if deadline.expired():
+            return deadline.PENDING, nodes_url
+        # Sin historia, el timeout en frío; con historia, el aprendido (ver checks/latency.py)
+        timeout = latency.timeout(nodes_url, cold=10)
         try:
-            async with session.get(nodes_url, headers=headers, timeout=timeout) as response:
+            async with probe.get(session, nodes_url, headers=headers, timeout=deadline.timeout(timeout)) as response:
                 if response.status == 200:
-                    json_response = await response.json()
-                    result = process_response(json_response, sessions)
+                    started = time.monotonic()
+                    result, scanned = await scan_response(response, sessions)
+                    logger.info(f"{instance}: {scanned} nodos evaluados en {(time.monotonic() - started) * 1000:.1f} ms")
                     return result, nodes_url
                 else:
                     error_message = f"HTTP {response.status} - {response.reason}"
+        except breaker.CircuitOpenError as e:
+            return str(e), nodes_url
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             error_message = str(e)
-        if attempt < retries - 1:
-            await asyncio.sleep(backoff_factor * (2**attempt))
+        if attempt < retries - 1 and not await deadline.backoff(backoff_factor * (2 ** attempt)):
+            return deadline.PENDING, nodes_url
 
+    if deadline.expired():
+        return deadline.PENDING, nodes_url
     if error_message and "Timeout" in error_message:
         return "Timeout luego de 3 intentos", nodes_url
     return error_message, nodes_url
 
 
-def process_response(json_response, sessions):
-    required_ids = [
-        "risk-calculator-", "risk-", "fix-", "markets-connector-mtr-", "api-risk-"
-    ]
+REQUIRED_PREFIXES = ("risk-calculator-", "risk-", "fix-", "markets-connector-mtr-", "api-risk-")
+# Nodos opcionales según las sesiones de la instancia, en el orden en que se informan
+OPTIONAL_PREFIXES = {"F": "markets-connector-mfci-", "B": "markets-connector-byma-"}
+
+_WHITESPACE = re.compile(r'\s*')
+_SEPARATORS = re.compile(r'[\s,]*')
+_COLON = re.compile(r'\s*:\s*')
+_decoder = json.JSONDecoder()
+
+
+@lru_cache(maxsize=None)
+def _prefix_index(optional):
+    # Prefijos agrupados por largo: cada id se resuelve con un lookup por largo distinto
+    index = {}
+    for prefix in REQUIRED_PREFIXES + optional:
+        index.setdefault(len(prefix), set()).add(prefix)
+    return index
+
+
+def _optional(sessions):
+    return tuple(prefix for code, prefix in OPTIONAL_PREFIXES.items() if code in (sessions or ()))
 
-    response_ids = [item['id'] for item in json_response['response']]
 
-    missing_required_ids = [
-        rid for rid in required_ids
-        if not any(id.startswith(rid) for id in response_ids)
-    ]
+def _match(index, node_id, pending):
+    for length, prefixes in index.items():
+        prefix = node_id[:length]
+        if prefix in prefixes:
+            pending.discard(prefix)
 
+
+def _verdict(pending, optional):
+    missing_required_ids = [rid for rid in REQUIRED_PREFIXES if rid in pending]
     if missing_required_ids:
         return f"Faltan nodos requeridos: {', '.join(missing_required_ids)}"
 
-    if 'F' in sessions and not any(id.startswith("markets-connector-mfci-") for id in response_ids):
-        return "Falta el nodo opcional: markets-connector-mfci-"
-
-    if 'B' in sessions and not any(id.startswith("markets-connector-byma-") for id in response_ids):
-        return "Falta el nodo opcional: markets-connector-byma-"
+    for prefix in optional:
+        if prefix in pending:
+            return f"Falta el nodo opcional: {prefix}"
 
     return True
 
 
-async def run_check():
-    check_name = "Check Nodes"
+def _top_level_array(buffer, seek):
+    # Recorre las claves de primer nivel (salteando sus valores) hasta el array `response`.
+    # Devuelve (posición tras el "[", None) si lo encuentra, (None, desde dónde seguir) si
+    # falta texto, o (None, -1) si el documento no tiene esa forma y hay que leerlo completo
+    if seek == 0:
+        pos = _WHITESPACE.match(buffer).end()
+        if pos >= len(buffer):
+            return None, 0
+        if buffer[pos] != "{":
+            return None, -1
+        seek = pos + 1
+
+    while True:
+        pos = _SEPARATORS.match(buffer, seek).end()
+        if pos >= len(buffer):
+            return None, seek
+        if buffer[pos] == "}":
+            return None, -1
+        try:
+            key, pos = _decoder.raw_decode(buffer, pos)
+            colon = _COLON.match(buffer, pos)
+            if not isinstance(key, str) or colon is None:
+                return (None, seek) if not buffer[pos:].strip() else (None, -1)
+            pos = colon.end()
+            if pos >= len(buffer):
+                return None, seek
+            if key == "response":
+                return (pos + 1, None) if buffer[pos] == "[" else (None, -1)
+            _, seek = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Clave o valor incompleto: esperar el próximo chunk
+            return None, seek
+
+
+def process_response(json_response, sessions):
+    optional = _optional(sessions)
+    index = _prefix_index(optional)
+    pending = set(REQUIRED_PREFIXES + optional)
+    for item in json_response['response']:
+        _match(index, item['id'], pending)
+        if not pending:
+            break
+    return _verdict(pending, optional)
+
+
+async def scan_response(response, sessions):
+    # Recorre el array `response` a medida que llega y deja de leer apenas están todos
+    # los prefijos. Devuelve (resultado, nodos evaluados)
+    optional = _optional(sessions)
+    index = _prefix_index(optional)
+    pending = set(REQUIRED_PREFIXES + optional)
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = None  # posición dentro del array; None hasta encontrarlo
+    seek = 0  # por dónde sigue la búsqueda de la clave; -1 si no hay que buscar más
+    scanned = 0
+
+    async for chunk in response.content.iter_chunked(probe.BODY_CHUNK_SIZE):
+        buffer += text.decode(chunk)
+        if pos is None:
+            if seek < 0:
+                continue
+            pos, seek = _top_level_array(buffer, seek)
+            if pos is None:
+                continue
+
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos >= len(buffer) or buffer[pos] == "]":
+                break
+            try:
+                item, pos = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Elemento incompleto: esperar el próximo chunk
+                break
+            scanned += 1
+            _match(index, item['id'], pending)
+            if not pending:
+                return _verdict(pending, optional), scanned
+
+        if pos < len(buffer) and buffer[pos] == "]":
+            return _verdict(pending, optional), scanned
+        # Lo ya evaluado no se guarda
+        buffer = buffer[pos:]
+        pos = 0
+
+    if pos is None:
+        # Sin array `response` de primer nivel a la vista: se evalúa el documento completo como antes
+        json_response = json.loads(buffer + text.decode(b"", final=True))
+        return process_response(json_response, sessions), len(json_response.get('response', []))
+    raise ValueError("Respuesta de nodos incompleta")
+
+
+async def check_instance(session, env_code, base_url, url_path, token, sessions, instance, date):
+    result, full_url = await check_nodes_with_retry(session, env_code, base_url, url_path, token, sessions, instance)
+    if result is True:
+        output = "Nodes OK"
+        error = 0
+    elif result == deadline.PENDING or (result and "Timeout luego de 3 intentos" in result):
+        output = result
+        error = 0
+    else:
+        output = f"Error en: {full_url} - Detalles: {result}"
+        error = 1
+
+    return {
+        "check_name": CHECK_NAME,
+        "instance": instance,
+        "date": date,
+        "output": output,
+        "error": error
+    }
+
+
+async def plan():
     date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    all_logs = []
-
-    with ThreadPoolExecutor() as executor:
-        loop = asyncio.get_running_loop()
-        env_rows = await loop.run_in_executor(executor, fetch_envs)
-        endpoint_rows = await loop.run_in_executor(executor, fetch_endpoints)
-
-        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-            tasks = []
-            metadata = []
-
-            for env in env_rows:
-                env_code = env['env'].strip()
-                base_url = env['url'].strip()
-                token = env['token'].strip()
-                sessions = env['sessions'].strip()
-                instance = env['name'].strip()
-
-                for endpoint in endpoint_rows:
-                    url_path = endpoint['url'].strip()
-                    tasks.append(
-                        check_nodes_with_retry(session, env_code, base_url, url_path, token, sessions, instance)
-                    )
-                    metadata.append(instance)
-
-            results = await asyncio.gather(*tasks)
-
-            for (result, full_url), instance in zip(results, metadata):
-                if result is True:
-                    output = "Nodes OK"
-                    error = 0
-                elif result and "Timeout luego de 3 intentos" in result:
-                    output = result
-                    error = 0
-                else:
-                    output = f"Error en: {full_url} - Detalles: {result}"
-                    error = 1
 
-                all_logs.append((check_name, instance, date, output, error))
+    env_rows = await inventory.get_instancias()
+    endpoint_rows = await inventory.get_url_checks(type="NODES")
 
-        await loop.run_in_executor(executor, log_to_db_sync, all_logs)
+    session = http_client.get_session()
+    probes = []
 
-    return {"inserted_logs": len(all_logs), "status": "ok"}
+    for env in env_rows:
+        env_code = env['env']
+        base_url = env['url']
+        token = env['token']
+        sessions = env['sessions']
+        instance = env['name']
+
+        for endpoint in endpoint_rows:
+            url_path = endpoint['url']
+            nodes_url = f'https://api-risk.{env_code}.{base_url}.com.ar{url_path}'
+            probes.append(planner.Probe(
+                CHECK_NAME, instance, (nodes_url,),
+                partial(check_instance, session, env_code, base_url, url_path, token, sessions, instance, date),
+                variant=(token, tuple(sessions or ()))
+            ))
+    return probes
+
+
+async def run_check():
+    return await planner.run(plan)
 
 
 # Solo para pruebas manuales
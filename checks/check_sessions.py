@@ -1,27 +1,31 @@
 import asyncio
 import aiohttp
 import json
-import ssl
-import os
-from datetime import datetime, time
-from supabase import create_client, Client
-
-ssl_context = ssl.create_default_context()
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-assert SUPABASE_URL is not None, "Falta supabase_url"
-assert SUPABASE_KEY is not None, "Falta supabase_key"
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-CONCURRENT_REQUESTS = 10
+from datetime import datetime
+from functools import partial
+import checks.breaker as breaker
+import checks.deadline as deadline
+import checks.inventory as inventory
+import checks.latency as latency
+import checks.market as market
+import checks.probe as probe
+import checks.http_client as http_client
+import checks.planner as planner
+
+CHECK_NAME = "Check Sesiones"
+
+# Letra de sesión -> nombres en url_checks (type SESSION)
+SESSION_URLS = {
+    'P': ('PBCP',),
+    'R': ('ROFX',),
+    'M': ('MATRIZ',),
+    'B': ('BYMA_OR', 'BYMA_MDP', 'BYMA_CON'),
+}
 
 
 async def check_url_async(session, url, token, timeout):
     try:
-        async with session.get(url, headers={'Authorization': f'Basic {token}'}, timeout=timeout) as response:
+        async with probe.get(session, url, headers={'Authorization': f'Basic {token}'}, timeout=timeout) as response:
             response.raise_for_status()
             json_response = await response.json()
 
@@ -32,6 +36,8 @@ async def check_url_async(session, url, token, timeout):
                 return True, None
 
             return False, f'no se encontró ("loged":True), status: {response.status}'
+    except breaker.CircuitOpenError:
+        raise
     except aiohttp.ClientConnectionError as e:
         return False, f"Error de conexión: {e}"
     except asyncio.TimeoutError:
@@ -49,98 +55,91 @@ async def check_url_async(session, url, token, timeout):
 async def check_url_with_retry(session, url, token, timeout, retries=3, backoff_factor=0.5):
     error = None
     for attempt in range(retries):
-        result, current_error = await check_url_async(session, url, token, timeout)
+        if deadline.expired():
+            return False, deadline.PENDING
+        attempt_timeout = deadline.timeout(latency.timeout(url, cold=timeout))
+        try:
+            result, current_error = await check_url_async(session, url, token, attempt_timeout)
+        except breaker.CircuitOpenError as e:
+            # Host caído: no tiene sentido seguir reintentando
+            return False, str(e)
         if result:
             return result, current_error
-        elif attempt < retries - 1:
-            await asyncio.sleep(backoff_factor * (2 ** attempt))
+        elif attempt < retries - 1 and not await deadline.backoff(backoff_factor * (2 ** attempt)):
+            return False, deadline.PENDING
         error = current_error
+    if deadline.expired():
+        return False, deadline.PENDING
     return False, f"error luego de {retries} reintentos: {error}"
 
 
-async def process_instance_async(instance_data, session, semaphore):
-    instance = instance_data['name']
-    token = instance_data['token']
-    sessions = instance_data['sessions']
+def session_paths(url_checks, at=None):
+    # Letra de sesión -> [(nombre, path)], solo de las sesiones abiertas. Una vez por corrida
+    by_name = {row['name']: row['url'] for row in url_checks}
+    at = at or market.now()
+    paths = {}
+    for code, names in SESSION_URLS.items():
+        if market.is_open(code, at):
+            paths[code] = [(name, by_name[name]) for name in names if name in by_name]
+    return paths
+
+
+def build_urls(instance_data, paths):
     env = instance_data['env']
     url_base = instance_data['url']
 
     base = f"https://api-risk.{env}.{url_base}.com.ar"
 
-    checks = {
-        'P': 'PBCP',
-        'R': 'ROFX',
-        'M': 'MATRIZ',
-        'B_OR': 'BYMA_OR',
-        'B_MDP': 'BYMA_MDP',
-        'B_CON': 'BYMA_CON'
-    }
-
     urls_to_check = {}
-    now = datetime.now().time()
-    skip_matriz = now < time(9, 36)
-    skip_byma = now < time(9, 17)
-
-    for s in sessions:
-        if s == 'M':
-            if skip_matriz:
-                continue
-            name = checks.get('M')
-            if name:
-                url_row = next((u for u in instance_data['urls'] if u['name'] == name), None)
-                if url_row:
-                    urls_to_check[name] = base + url_row['url']
-
-        elif s == 'B':
-            for suffix in ['OR', 'MDP', 'CON']:
-                if skip_byma:
-                    continue
-                name = f"BYMA_{suffix}"
-                url_row = next((u for u in instance_data['urls'] if u['name'] == name), None)
-                if url_row:
-                    urls_to_check[name] = base + url_row['url']
-
-        else:
-            name = checks.get(s)
-            if name:
-                url_row = next((u for u in instance_data['urls'] if u['name'] == name), None)
-                if url_row:
-                    urls_to_check[name] = base + url_row['url']
-
-    timeout = 50 if instance == "Inviu" else 15
+    for s in instance_data['sessions'] or ():
+        for name, path in paths.get(s, ()):
+            urls_to_check[name] = base + path
+
+    return urls_to_check
+
+
+async def process_instance_async(instance_data, session, urls_to_check):
+    instance = instance_data['name']
+    token = instance_data['token']
+
+    # Timeout en frío; con historia, cada URL usa el que aprendió (ver checks/latency.py)
+    timeout = 15
     errores = []
     timeouts = []
+    pendientes = []
 
-    async with semaphore:
-        tasks = [check_url_with_retry(session, url, token, timeout) for url in urls_to_check.values()]
-        results = await asyncio.gather(*tasks)
+    # La concurrencia la regula el governor compartido (checks/governor.py)
+    tasks = [check_url_with_retry(session, url, token, timeout) for url in urls_to_check.values()]
+    results = await asyncio.gather(*tasks)
 
     for (key, url), (ok, error) in zip(urls_to_check.items(), results):
         if not ok:
-            if "Timeout" in str(error):
+            if error == deadline.PENDING:
+                pendientes.append(f"{key}: {error}")
+            elif "Timeout" in str(error):
                 timeouts.append(f"Timeout en {url}")
             else:
                 errores.append(f"{key}: {error}")
 
     if errores:
         return {
-            "check_name": "Check Sesiones",
+            "check_name": CHECK_NAME,
             "instance": instance,
             "date": datetime.now().isoformat(),
             "output": " | ".join(errores),
             "error": True
         }
-    elif timeouts:
+    elif timeouts or pendientes:
         return {
-            "check_name": "Check Sesiones",
+            "check_name": CHECK_NAME,
             "instance": instance,
             "date": datetime.now().isoformat(),
-            "output": " | ".join(timeouts),
+            "output": " | ".join(timeouts + pendientes),
             "error": False
         }
     else:
         return {
-            "check_name": "Check Sesiones",
+            "check_name": CHECK_NAME,
             "instance": instance,
             "date": datetime.now().isoformat(),
             "output": "Sesiones OK",
@@ -148,32 +147,37 @@ async def process_instance_async(instance_data, session, semaphore):
         }
 
 
-async def run_check():
-    instancias_res = supabase.table("instancias").select("*").eq("status", 1).execute()
-    instancias = instancias_res.data
+async def plan():
+    instancias = await inventory.get_instancias()
+    url_checks = await inventory.get_url_checks(type="SESSION")
 
-    urls_res = supabase.table("url_checks").select("name,url").eq("type", "SESSION").execute()
-    url_checks = urls_res.data
+    paths = session_paths(url_checks)
 
-    instancias_data = []
+    session = http_client.get_session()
+    probes = []
     for inst in instancias:
-        inst_limpia = {k: v.strip() if isinstance(v, str) else v for k, v in inst.items()}
-        instancias_data.append({
-            **inst_limpia,
-            "urls": url_checks
-        })
-
-    semaphore = asyncio.Semaphore(CONCURRENT_REQUESTS)
+        urls_to_check = build_urls(inst, paths)
+        if not urls_to_check:
+            # Nada para chequear (p. ej. ninguna sesión en horario): no se le pega
+            cerradas = any(s in SESSION_URLS for s in inst['sessions'] or ())
+            probes.append(planner.resolved({
+                "check_name": CHECK_NAME,
+                "instance": inst["name"],
+                "date": datetime.now().isoformat(),
+                "output": "Sesiones fuera de horario de mercado" if cerradas else "Sesiones OK",
+                "error": False
+            }))
+            continue
+        probes.append(planner.Probe(
+            CHECK_NAME, inst["name"], tuple(urls_to_check.values()),
+            partial(process_instance_async, inst, session, urls_to_check),
+            variant=(inst["token"],)
+        ))
+    return probes
 
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-        tasks = [process_instance_async(row, session, semaphore) for row in instancias_data]
-        logs = await asyncio.gather(*tasks)
 
-    logs = [log for log in logs if log is not None]
-    if logs:
-        supabase.table("checks_logs").insert(logs).execute()
-
-    return {"inserted_logs": len(logs), "status": "ok"}
+async def run_check():
+    return await planner.run(plan)
 
 
 # Solo para correrlo manualmente
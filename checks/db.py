@@ -0,0 +1,48 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+# Cliente único: todas las consultas comparten su pool HTTP (httpx). Se crea en el primer
+# uso, así importar los chequeos (y arrancar un worker) no toca supabase ni la red
+_lock = threading.Lock()
+_state = {"client": None}
+
+
+def get_client():
+    with _lock:
+        if _state["client"] is None:
+            if not SUPABASE_URL or not SUPABASE_KEY:
+                raise RuntimeError("Faltan SUPABASE_URL / SUPABASE_KEY")
+            # Importar supabase (httpx, postgrest, ...) es lo más lento del arranque
+            from supabase import create_client
+            _state["client"] = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return _state["client"]
+
+
+# Hilos dedicados a Supabase, así el event loop nunca espera a la base
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="supabase")
+
+
+async def run(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, fn, *args)
+
+
+# Códigos de PostgREST/Postgres que rechazan los datos en sí: reintentar no sirve.
+# 22 dato inválido, 23 restricción, 42 columna o tipo, PGRST1xx/2xx pedido o esquema.
+# Los de conexión (08, PGRST0xx), JWT (PGRST3xx) y HTTP sin cuerpo JSON son reintentables
+_REJECTED_CODES = ("22", "23", "42", "PGRST1", "PGRST2")
+
+
+def is_rejected(error):
+    code = getattr(error, "code", None)
+    return isinstance(code, str) and code.startswith(_REJECTED_CODES)
+
+
+def insert_logs_sync(rows):
+    get_client().table("checks_logs").insert(rows).execute()
@@ -0,0 +1,51 @@
+import asyncio
+import contextvars
+import time
+import checks.tracing as tracing
+
+# Texto que se loguea para los probes que no llegaron a resolverse a tiempo
+PENDING = "Pendiente/timeout: se agotó el plazo de la corrida"
+
+# Piso para el timeout de un intento: aiohttp interpreta 0 como "sin timeout"
+MIN_TIMEOUT = 0.1
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+def start(seconds):
+    # Vale para la tarea actual y las que se creen desde ella
+    return _deadline.set(time.monotonic() + seconds)
+
+
+def reset(token):
+    _deadline.reset(token)
+
+
+def remaining():
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def expired():
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def timeout(seconds):
+    # Recorta el timeout de un intento a lo que queda del presupuesto
+    left = remaining()
+    if left is None:
+        return seconds
+    return max(MIN_TIMEOUT, min(seconds, left))
+
+
+async def backoff(delay):
+    # Duerme solo si después queda presupuesto para otro intento
+    left = remaining()
+    if left is not None and left <= delay:
+        return False
+    with tracing.span("backoff", seconds=delay):
+        await asyncio.sleep(delay)
+    return True
@@ -0,0 +1,50 @@
+import aiohttp
+import asyncio
+import checks.breaker as breaker
+import checks.deadline as deadline
+import checks.latency as latency
+import checks.liveness as liveness
+import checks.probe as probe
+
+# Chequeo de los fronts de plataforma (admin, matriz, etrader): el tier rápido de
+# checks/liveness.py y, si no alcanza, un GET completo con retry. Cambia solo el texto del OK.
+
+
+async def check_url_async(session, url, retries=3, backoff_factor=0.3):
+    for attempt in range(retries):
+        if deadline.expired():
+            return None, url
+        try:
+            async with probe.get(session, url, timeout=deadline.timeout(latency.timeout(url, cold=30))) as response:
+                response.raise_for_status()
+                await probe.discard(response)
+                return True, url
+        except breaker.CircuitOpenError as e:
+            return False, f"{url} - {e}"
+        except (aiohttp.ClientConnectionError, aiohttp.ClientResponseError):
+            if attempt < retries - 1 and not await deadline.backoff(backoff_factor * (2 ** attempt)):
+                return None, url
+        except asyncio.TimeoutError:
+            return (None if deadline.expired() else False), url
+    return False, url
+
+
+async def check_instance(session, check_name, ok_output, full_url, name, date):
+    if await liveness.alive(session, full_url):
+        success, checked_url = True, full_url
+    else:
+        success, checked_url = await check_url_async(session, full_url)
+        if success:
+            liveness.full_done(full_url)
+    if success is None:
+        output, error = deadline.PENDING, 0
+    else:
+        output = ok_output if success else checked_url
+        error = 0 if success else 1
+    return {
+        "check_name": check_name,
+        "instance": name,
+        "date": date,
+        "output": output,
+        "error": error
+    }
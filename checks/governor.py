@@ -0,0 +1,52 @@
+import asyncio
+import contextlib
+import os
+import checks.deadline as deadline
+
+# Tope de probes en vuelo, total y por host, para todos los chequeos juntos
+GOVERNOR_MAX_INFLIGHT = int(os.getenv("GOVERNOR_MAX_INFLIGHT", "50"))
+GOVERNOR_MAX_PER_HOST = int(os.getenv("GOVERNOR_MAX_PER_HOST", "6"))
+
+# Los semáforos quedan atados a su event loop: un juego por loop
+_limits = {}
+
+
+def _for_loop():
+    loop = asyncio.get_running_loop()
+    limits = _limits.get(loop)
+    if limits is None:
+        limits = _limits[loop] = {"total": asyncio.Semaphore(GOVERNOR_MAX_INFLIGHT), "hosts": {}}
+    return limits
+
+
+@contextlib.asynccontextmanager
+async def slot(host):
+    limits = _for_loop()
+    per_host = limits["hosts"].get(host)
+    if per_host is None:
+        per_host = limits["hosts"][host] = asyncio.Semaphore(GOVERNOR_MAX_PER_HOST)
+
+    # Primero el cupo del host, así la espera por un host ocupado no retiene cupo global.
+    # La espera en cola también respeta el plazo de la corrida.
+    async with asyncio.timeout(deadline.remaining()):
+        await per_host.acquire()
+        try:
+            await limits["total"].acquire()
+        except BaseException:
+            per_host.release()
+            raise
+    try:
+        yield
+    finally:
+        limits["total"].release()
+        per_host.release()
+
+
+def inflight():
+    limits = _limits.get(asyncio.get_running_loop())
+    if limits is None:
+        return {"total": 0, "hosts": {}}
+    return {
+        "total": GOVERNOR_MAX_INFLIGHT - limits["total"]._value,
+        "hosts": {host: GOVERNOR_MAX_PER_HOST - sem._value for host, sem in limits["hosts"].items() if sem._value < GOVERNOR_MAX_PER_HOST},
+    }
@@ -0,0 +1,259 @@
+import json
+import logging
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+import checks.deadline as deadline
+import checks.market as market
+
+logger = logging.getLogger(__name__)
+
+# Historial local de resultados (SQLite) con agregados por minuto, hora y día,
+# para responder disponibilidad sin ir a checks_logs en Supabase
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") == "1"
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "checks_history.sqlite3")
+# Días que se guardan los agregados por minuto y por hora; los diarios quedan
+HISTORY_MINUTE_DAYS = float(os.getenv("HISTORY_MINUTE_DAYS", "3"))
+HISTORY_HOUR_DAYS = float(os.getenv("HISTORY_HOUR_DAYS", "90"))
+HISTORY_PRUNE_INTERVAL = 3600
+# Días de agregados por hora con los que se arrancan los perfiles de latencia tras un reinicio
+HISTORY_SEED_DAYS = float(os.getenv("HISTORY_SEED_DAYS", "7"))
+
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+# Límites superiores (segundos) del histograma de latencia de cada agregado
+LATENCY_BOUNDS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, math.inf)
+
+# Solo agregados: las filas crudas de versiones anteriores no las leía nadie y se borran
+_SCHEMA = """
+DROP TABLE IF EXISTS results;
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution TEXT, start REAL, check_name TEXT, instance TEXT,
+    total INTEGER, failures INTEGER, pending INTEGER, latency_max REAL, histogram TEXT,
+    PRIMARY KEY (resolution, check_name, instance, start)
+);
+CREATE INDEX IF NOT EXISTS rollups_by_start ON rollups (resolution, start);
+"""
+
+_queue = queue.Queue()
+_state = {"pid": None, "pruned_at": 0}
+
+
+def _connect():
+    conn = sqlite3.connect(HISTORY_DB_PATH, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _ensure_worker():
+    # Tras un fork (gunicorn) el hilo no existe en el hijo
+    if _state["pid"] != os.getpid():
+        _state["pid"] = os.getpid()
+        threading.Thread(target=_worker, name="checks-history", daemon=True).start()
+
+
+def add(rows, seconds=None):
+    # seconds: lo que tardó el último intento del probe que produjo las filas (None si no fue a la red)
+    if not HISTORY_ENABLED or not rows:
+        return
+    _ensure_worker()
+    _queue.put((time.time(), rows, seconds))
+
+
+def _bucket_start(ts, size):
+    # Los cortes de hora y día siguen la zona del mercado, no UTC
+    offset = datetime.fromtimestamp(ts, market.ZONE).utcoffset()
+    offset = offset.total_seconds() if offset is not None else -time.timezone
+    return math.floor((ts + offset) / size) * size - offset
+
+
+def _empty():
+    return {"total": 0, "failures": 0, "pending": 0, "latency_max": None, "histogram": [0] * len(LATENCY_BOUNDS)}
+
+
+def _merge(into, other):
+    into["total"] += other["total"]
+    into["failures"] += other["failures"]
+    into["pending"] += other["pending"]
+    if other["latency_max"] is not None:
+        into["latency_max"] = max(into["latency_max"] or 0, other["latency_max"])
+    into["histogram"] = [a + b for a, b in zip(into["histogram"], other["histogram"])]
+
+
+def _count(agg, row, seconds):
+    pending = row["output"] == deadline.PENDING
+    agg["total"] += 1
+    agg["pending"] += pending
+    agg["failures"] += bool(row["error"]) and not pending
+    if seconds is not None and not pending:
+        agg["latency_max"] = max(agg["latency_max"] or 0, seconds)
+        agg["histogram"][next(i for i, bound in enumerate(LATENCY_BOUNDS) if seconds <= bound)] += 1
+
+
+def _write(conn, items):
+    rollups = {}
+    for ts, rows, seconds in items:
+        for row in rows:
+            for resolution, size in RESOLUTIONS.items():
+                key = (resolution, _bucket_start(ts, size), row["check_name"], row["instance"])
+                _count(rollups.setdefault(key, _empty()), row, seconds)
+
+    with conn:
+        # Un solo escritor: leer, sumar y reemplazar no compite con nadie
+        for key, agg in rollups.items():
+            current = conn.execute(
+                "SELECT total, failures, pending, latency_max, histogram FROM rollups"
+                " WHERE resolution = ? AND start = ? AND check_name = ? AND instance = ?", key
+            ).fetchone()
+            if current is not None:
+                _merge(agg, _from_db(current))
+            conn.execute(
+                "INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                key + (agg["total"], agg["failures"], agg["pending"], agg["latency_max"], json.dumps(agg["histogram"])),
+            )
+
+
+def _from_db(row):
+    total, failures, pending, latency_max, histogram = row
+    return {"total": total, "failures": failures, "pending": pending, "latency_max": latency_max, "histogram": json.loads(histogram)}
+
+
+def _prune(conn):
+    now = time.time()
+    if now - _state["pruned_at"] < HISTORY_PRUNE_INTERVAL:
+        return
+    _state["pruned_at"] = now
+    with conn:
+        conn.execute("DELETE FROM rollups WHERE resolution = 'minute' AND start < ?", (now - HISTORY_MINUTE_DAYS * 86400,))
+        conn.execute("DELETE FROM rollups WHERE resolution = 'hour' AND start < ?", (now - HISTORY_HOUR_DAYS * 86400,))
+
+
+def _worker():
+    global HISTORY_ENABLED
+    try:
+        conn = _connect()
+    except Exception as e:
+        # Sin base el historial queda apagado; el hilo sigue vaciando la cola para que flush() no se cuelgue
+        logger.error(f"No se pudo abrir el historial local {HISTORY_DB_PATH}, queda desactivado: {e}")
+        HISTORY_ENABLED = False
+        conn = None
+    while True:
+        items = [_queue.get()]
+        while not _queue.empty():
+            items.append(_queue.get_nowait())
+        try:
+            if conn is not None:
+                _write(conn, items)
+                _prune(conn)
+        except Exception as e:
+            logger.error(f"Error guardando el historial local: {e}")
+        finally:
+            for _ in items:
+                _queue.task_done()
+
+
+def flush():
+    # Espera a que lo encolado quede escrito
+    if _state["pid"] == os.getpid():
+        _queue.join()
+
+
+def _percentile(histogram, latency_max, q):
+    total = sum(histogram)
+    if not total:
+        return None
+    target = q * total
+    seen = 0
+    for count, bound in zip(histogram, LATENCY_BOUNDS):
+        seen += count
+        if seen >= target:
+            return latency_max if bound == math.inf else min(bound, latency_max)
+    return latency_max
+
+
+def _resolution_for(span):
+    if span <= 6 * 3600:
+        return "minute"
+    if span <= 14 * 86400:
+        return "hour"
+    return "day"
+
+
+def latency_p99(pairs, days=HISTORY_SEED_DAYS):
+    # (check_name, instance) -> p99 de la latencia de los últimos días; los pares sin datos no vienen
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    check_names = sorted({check_name for check_name, _ in pairs})
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT check_name, instance, total, failures, pending, latency_max, histogram FROM rollups"
+            f" WHERE resolution = 'hour' AND start >= ? AND check_name IN ({', '.join('?' for _ in check_names)})",
+            [time.time() - days * 86400] + check_names,
+        ).fetchall()
+    finally:
+        conn.close()
+
+    per_instance = {}
+    for check_name, instance_name, *agg in rows:
+        if (check_name, instance_name) in pairs:
+            _merge(per_instance.setdefault((check_name, instance_name), _empty()), _from_db(agg))
+
+    result = {}
+    for pair, agg in per_instance.items():
+        p99 = _percentile(agg["histogram"], agg["latency_max"], 0.99)
+        if p99 is not None:
+            result[pair] = p99
+    return result
+
+
+def availability(since, until, check_names=None, instance=None, resolution=None):
+    resolution = resolution or _resolution_for(until - since)
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Resolución inválida: {resolution}")
+
+    query = "SELECT check_name, instance, total, failures, pending, latency_max, histogram FROM rollups WHERE resolution = ? AND start >= ? AND start < ?"
+    params = [resolution, _bucket_start(since, RESOLUTIONS[resolution]), until]
+    if check_names:
+        query += f" AND check_name IN ({', '.join('?' for _ in check_names)})"
+        params += list(check_names)
+    if instance:
+        query += " AND instance = ?"
+        params.append(instance)
+
+    conn = _connect()
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+    per_instance = {}
+    for check_name, instance_name, *agg in rows:
+        _merge(per_instance.setdefault((check_name, instance_name), _empty()), _from_db(agg))
+
+    results = []
+    for (check_name, instance_name), agg in sorted(per_instance.items()):
+        answered = agg["total"] - agg["pending"]
+        results.append({
+            "check_name": check_name,
+            "instance": instance_name,
+            "total": agg["total"],
+            "failures": agg["failures"],
+            "pending": agg["pending"],
+            "uptime": round(1 - agg["failures"] / answered, 6) if answered else None,
+            "p50": _percentile(agg["histogram"], agg["latency_max"], 0.50),
+            "p95": _percentile(agg["histogram"], agg["latency_max"], 0.95),
+            "p99": _percentile(agg["histogram"], agg["latency_max"], 0.99),
+        })
+
+    return {
+        "from": datetime.fromtimestamp(since, market.ZONE).isoformat(),
+        "to": datetime.fromtimestamp(until, market.ZONE).isoformat(),
+        "resolution": resolution,
+        "results": results,
+    }
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import ssl
+import aiohttp
+import checks.governor as governor
+import checks.metrics as metrics
+import checks.probe as probe
+
+# SSL compartido por todos los chequeos (compatible con Replit)
+ssl_context = ssl.create_default_context()
+if hasattr(ssl, "OP_LEGACY_SERVER_CONNECT"):
+    ssl_context.options |= ssl.OP_LEGACY_SERVER_CONNECT
+
+# DNS y keep-alive del pool compartido
+DNS_CACHE_TTL = int(os.getenv("DNS_CACHE_TTL", "300"))
+KEEPALIVE_TIMEOUT = float(os.getenv("KEEPALIVE_TIMEOUT", "60"))
+
+# Una sesión por event loop: con el loop persistente de la app hay una sola
+_sessions = {}
+
+
+def get_session():
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            ssl=ssl_context,
+            # Mismos topes que el governor (ver checks/governor.py)
+            limit=governor.GOVERNOR_MAX_INFLIGHT,
+            limit_per_host=governor.GOVERNOR_MAX_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        session = aiohttp.ClientSession(connector=connector, trace_configs=[metrics.trace_config(), probe.trace_config()])
+        _sessions[loop] = session
+    return session
+
+
+async def close_session():
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
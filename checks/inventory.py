@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+import checks.db as db
+import checks.tracing as tracing
+
+# Segundos que se reutiliza la configuración antes de volver a pedirla
+INVENTORY_TTL = float(os.getenv("INVENTORY_TTL", "300"))
+
+_lock = threading.Lock()
+_cache = {"instancias": [], "url_checks": [], "loaded_at": None}
+
+
+def _limpiar(row):
+    return {k: v.strip() if isinstance(v, str) else v for k, v in row.items()}
+
+
+def _fetch():
+    supabase = db.get_client()
+    instancias = supabase.table("instancias").select("*").eq("status", 1).execute().data
+    url_checks = supabase.table("url_checks").select("*").execute().data
+    return [_limpiar(row) for row in instancias or []], [_limpiar(row) for row in url_checks or []]
+
+
+def _is_fresh():
+    loaded_at = _cache["loaded_at"]
+    return loaded_at is not None and time.monotonic() - loaded_at < INVENTORY_TTL
+
+
+def load(force=False):
+    # Un solo fetch aunque varios chequeos lo pidan a la vez
+    with _lock:
+        if force or not _is_fresh():
+            instancias, url_checks = _fetch()
+            _cache["instancias"] = instancias
+            _cache["url_checks"] = url_checks
+            _cache["loaded_at"] = time.monotonic()
+        return _cache
+
+
+def invalidate():
+    with _lock:
+        _cache["loaded_at"] = None
+
+
+async def _get_cache():
+    if _is_fresh():
+        return _cache
+    with tracing.span("inventario (Supabase)"):
+        return await db.run(load)
+
+
+# Las filas devueltas son compartidas: no modificarlas
+async def get_instancias():
+    cache = await _get_cache()
+    return cache["instancias"]
+
+
+async def get_url_checks(type=None, name=None):
+    cache = await _get_cache()
+    return [
+        row for row in cache["url_checks"]
+        if (type is None or row.get("type") == type) and (name is None or row.get("name") == name)
+    ]
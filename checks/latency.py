@@ -0,0 +1,80 @@
+import asyncio
+import contextlib
+import math
+import os
+import time
+from collections import deque
+
+# Perfil de latencia por probe (URL): EWMA + ventana para p95/p99
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "100"))
+LATENCY_MIN_SAMPLES = int(os.getenv("LATENCY_MIN_SAMPLES", "5"))
+LATENCY_ALPHA = float(os.getenv("LATENCY_ALPHA", "0.2"))
+
+# timeout = max(p99 * P99_FACTOR, ewma * EWMA_FACTOR), acotado entre piso y techo
+TIMEOUT_P99_FACTOR = float(os.getenv("TIMEOUT_P99_FACTOR", "2"))
+TIMEOUT_EWMA_FACTOR = float(os.getenv("TIMEOUT_EWMA_FACTOR", "4"))
+TIMEOUT_FLOOR = float(os.getenv("TIMEOUT_FLOOR", "3"))
+TIMEOUT_CEILING = float(os.getenv("TIMEOUT_CEILING", "60"))
+
+_profiles = {}
+# Timeout en frío por probe sacado del historial local (ver seed); reemplaza al del chequeo
+_seeds = {}
+
+
+def record(key, seconds):
+    profile = _profiles.get(key)
+    if profile is None:
+        profile = _profiles[key] = {"ewma": seconds, "samples": deque(maxlen=LATENCY_WINDOW)}
+    else:
+        profile["ewma"] += LATENCY_ALPHA * (seconds - profile["ewma"])
+    profile["samples"].append(seconds)
+
+
+def _percentile(ordered, q):
+    index = max(0, math.ceil(q * len(ordered)) - 1)
+    return ordered[index]
+
+
+def profile(key):
+    data = _profiles.get(key)
+    if data is None:
+        return None
+    ordered = sorted(data["samples"])
+    return {
+        "count": len(ordered),
+        "ewma": data["ewma"],
+        "p95": _percentile(ordered, 0.95),
+        "p99": _percentile(ordered, 0.99),
+    }
+
+
+def _bounded(seconds):
+    return min(TIMEOUT_CEILING, max(TIMEOUT_FLOOR, seconds))
+
+
+def seed(key, p99):
+    # p99 que el historial guardó para la instancia: sirve hasta juntar muestras propias
+    _seeds[key] = _bounded(p99 * TIMEOUT_P99_FACTOR)
+
+
+def timeout(key, cold):
+    # Sin historia suficiente se usa la semilla del historial o, si no hay, el timeout "en frío" del chequeo
+    stats = profile(key)
+    if stats is None or stats["count"] < LATENCY_MIN_SAMPLES:
+        return _seeds.get(key, cold)
+    return _bounded(max(stats["p99"] * TIMEOUT_P99_FACTOR, stats["ewma"] * TIMEOUT_EWMA_FACTOR))
+
+
+@contextlib.contextmanager
+def measure(key, attempt=None):
+    # Registra respuestas y timeouts; los errores de conexión (y los timeouts sin conexión,
+    # ver attempt["connected"] en checks/probe.py) no dicen nada de la latencia
+    started = time.monotonic()
+    try:
+        yield
+    except asyncio.TimeoutError:
+        if attempt is None or attempt["connected"]:
+            record(key, time.monotonic() - started)
+        raise
+    else:
+        record(key, time.monotonic() - started)
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import threading
+import time
+import checks.log_sink as log_sink
+
+# Solo se loguean cambios de estado, más un latido cada LOG_HEARTBEAT segundos por instancia.
+# La API sigue viendo el estado completo.
+LOG_CHANGES_ONLY = os.getenv("LOG_CHANGES_ONLY", "0") == "1"
+LOG_HEARTBEAT = float(os.getenv("LOG_HEARTBEAT", "3600"))
+# check_name que loguean así aunque LOG_CHANGES_ONLY esté apagado (ver checks/scheduler.py)
+_changes_only = set()
+
+# Último resultado conocido por chequeo e instancia
+_lock = threading.Lock()
+_latest = {}
+_updated_at = {}
+# (check_name, instance) -> (estado, momento) de la última fila enviada a checks_logs
+_logged = {}
+
+# Colas de quienes siguen los resultados en vivo (endpoints de streaming)
+_subscribers = set()
+# Filas ya publicadas por la última corrida de cada chequeo (en curso o recién terminada),
+# para que un stream que se engancha tarde las reciba primero
+_published = {}
+
+
+def record(rows):
+    now = time.time()
+    por_check = {}
+    for row in rows:
+        por_check.setdefault(row["check_name"], {})[row["instance"]] = row
+
+    with _lock:
+        for check_name, por_instancia in por_check.items():
+            _latest[check_name] = por_instancia
+            _updated_at[check_name] = now
+        rows = [
+            row for row in rows
+            if not (LOG_CHANGES_ONLY or row["check_name"] in _changes_only) or _should_log(row, now)
+        ]
+
+    if rows:
+        log_sink.enqueue(rows)
+
+
+def log_changes_only(check_name):
+    _changes_only.add(check_name)
+
+
+def _should_log(row, now):
+    key = (row["check_name"], row["instance"])
+    state = (bool(row["error"]), row["output"])
+    previous = _logged.get(key)
+    if previous is not None and previous[0] == state and now - previous[1] < LOG_HEARTBEAT:
+        return False
+    _logged[key] = (state, now)
+    return True
+
+
+def snapshot(check_names):
+    # Devuelve las filas y el momento de la actualización más vieja (None si falta alguna)
+    with _lock:
+        if any(name not in _updated_at for name in check_names):
+            return [], None
+        rows = [row for name in check_names for row in _latest[name].values()]
+        return rows, min(_updated_at[name] for name in check_names)
+
+
+def subscribe():
+    queue = asyncio.Queue()
+    _subscribers.add(queue)
+    return queue
+
+
+def unsubscribe(queue):
+    _subscribers.discard(queue)
+
+
+def begin(check_name):
+    with _lock:
+        _published[check_name] = {}
+
+
+def published(check_names):
+    with _lock:
+        return [row for name in check_names for row in _published.get(name, {}).values()]
+
+
+def publish(row):
+    with _lock:
+        _published.setdefault(row["check_name"], {})[row["instance"]] = row
+    for queue in list(_subscribers):
+        queue.put_nowait(row)
+
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import time
+import aiohttp
+import checks.breaker as breaker
+import checks.deadline as deadline
+import checks.latency as latency
+import checks.probe as probe
+
+# Tier rápido para los chequeos de plataforma: un HEAD alcanza para saber que el front
+# responde. El GET completo se hace cada LIVENESS_FULL_INTERVAL o cuando el HEAD falla.
+LIVENESS_ENABLED = os.getenv("LIVENESS_ENABLED", "1") == "1"
+LIVENESS_FULL_INTERVAL = float(os.getenv("LIVENESS_FULL_INTERVAL", "900"))
+LIVENESS_TIMEOUT = float(os.getenv("LIVENESS_TIMEOUT", "5"))
+# Intervalo por defecto del scheduler para los chequeos que usan el tier rápido
+LIVENESS_INTERVAL = float(os.getenv("LIVENESS_INTERVAL", "60"))
+LIVENESS_CHECKS = ("admin", "matriz", "etrader")
+
+_last_full = {}
+
+
+def full_due(url):
+    last = _last_full.get(url)
+    return last is None or time.monotonic() - last >= LIVENESS_FULL_INTERVAL
+
+
+def full_done(url):
+    _last_full[url] = time.monotonic()
+
+
+async def alive(session, url):
+    # True si el tier rápido alcanza; False si hay que hacer el GET completo
+    if not LIVENESS_ENABLED or full_due(url) or deadline.expired():
+        return False
+    timeout = deadline.timeout(latency.timeout(f"HEAD {url}", cold=LIVENESS_TIMEOUT))
+    try:
+        async with probe.head(session, url, timeout=timeout, allow_redirects=True) as response:
+            # 405/501: el front no acepta HEAD; lo decide el GET
+            return response.status < 400
+    except (breaker.CircuitOpenError, aiohttp.ClientError, asyncio.TimeoutError):
+        return False
@@ -0,0 +1,153 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import checks.db as db
+import checks.tracing as tracing
+
+logger = logging.getLogger(__name__)
+
+# Buffer compartido de checks_logs: se vuelca en bloque desde un hilo propio
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "2"))
+LOG_RETRIES = int(os.getenv("LOG_RETRIES", "3"))
+LOG_BACKOFF = float(os.getenv("LOG_BACKOFF", "0.5"))
+LOG_SPOOL_PATH = os.getenv("LOG_SPOOL_PATH", "checks_logs_spool.jsonl")
+# Tras un fallo de conexión, segundos sin reintentar: lo nuevo se agrega al spool sin reescribirlo
+LOG_SPOOL_RETRY = float(os.getenv("LOG_SPOOL_RETRY", "30"))
+# Filas que Supabase rechaza por sus datos (no se reintentan)
+LOG_REJECTED_PATH = os.getenv("LOG_REJECTED_PATH", "checks_logs_rejected.jsonl")
+
+_cond = threading.Condition()
+_flush_lock = threading.Lock()
+_buffer = []
+# Corridas con filas en el buffer, para anotarles la inserción en su traza
+_buffer_runs = {}
+_state = {"pid": None, "retry_at": 0.0}
+
+
+def _ensure_worker():
+    # Tras un fork (gunicorn) el hilo no existe en el hijo
+    if _state["pid"] != os.getpid():
+        _state["pid"] = os.getpid()
+        threading.Thread(target=_worker, name="checks-log-sink", daemon=True).start()
+
+
+def enqueue(rows):
+    if not rows:
+        return
+    with _cond:
+        _ensure_worker()
+        _buffer.extend(rows)
+        run = tracing.current()
+        if run is not None:
+            _, count = _buffer_runs.get(run["id"], (run, 0))
+            _buffer_runs[run["id"]] = (run, count + len(rows))
+        if len(_buffer) >= LOG_BATCH_SIZE:
+            _cond.notify()
+
+
+def _take():
+    with _cond:
+        rows = _buffer[:]
+        del _buffer[:]
+        runs = list(_buffer_runs.values())
+        _buffer_runs.clear()
+        return rows, runs
+
+
+def _worker():
+    while True:
+        with _cond:
+            _cond.wait_for(lambda: len(_buffer) >= LOG_BATCH_SIZE, timeout=LOG_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Error volcando checks_logs: {e}")
+
+
+def _insert(chunk):
+    # Devuelve cuántas filas del principio del bloque quedaron resueltas (insertadas o en
+    # cuarentena); si son menos que el bloque, Supabase no está disponible
+    for attempt in range(LOG_RETRIES):
+        try:
+            db.insert_logs_sync(chunk)
+            return len(chunk)
+        except Exception as e:
+            if db.is_rejected(e):
+                return _bisect(chunk, e)
+            logger.warning(f"Fallo insertando {len(chunk)} logs (intento {attempt + 1}): {e}")
+            if attempt < LOG_RETRIES - 1:
+                time.sleep(LOG_BACKOFF * (2 ** attempt))
+    return 0
+
+
+def _bisect(chunk, error):
+    # Supabase rechazó el bloque por sus datos: se parte hasta aislar las filas malas
+    if len(chunk) == 1:
+        _quarantine(chunk[0], error)
+        return 1
+    mid = len(chunk) // 2
+    done = _insert(chunk[:mid])
+    if done < mid:
+        return done
+    return mid + _insert(chunk[mid:])
+
+
+def _quarantine(row, error):
+    with open(LOG_REJECTED_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"error": str(error), "row": row}, default=str) + "\n")
+    logger.error(f"Log rechazado por Supabase, guardado en {LOG_REJECTED_PATH}: {error}")
+
+
+def _read_spool():
+    if not os.path.exists(LOG_SPOOL_PATH):
+        return []
+    with open(LOG_SPOOL_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _write_spool(rows, mode="w"):
+    # "w" reescribe el spool con todo lo pendiente; "a" agrega filas nuevas
+    with open(LOG_SPOOL_PATH, mode, encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, default=str) + "\n")
+
+
+def flush():
+    with _flush_lock:
+        started = time.time()
+        taken, runs = _take()
+        if time.monotonic() < _state["retry_at"]:
+            # Supabase falló hace poco: no se reintenta todavía, lo nuevo se agrega al spool
+            _write_spool(taken, "a")
+            ok = not taken
+        else:
+            # Primero lo que quedó pendiente de corridas anteriores
+            spooled = _read_spool()
+            rows = spooled + taken
+            ok, i = True, 0
+            while i < len(rows):
+                chunk = rows[i:i + LOG_BATCH_SIZE]
+                done = _insert(chunk)
+                i += done
+                if done < len(chunk):
+                    ok = False
+                    break
+            if not ok:
+                _write_spool(rows[i:])
+                _state["retry_at"] = time.monotonic() + LOG_SPOOL_RETRY
+                logger.error(f"Supabase no disponible: {len(rows) - i} logs guardados en {LOG_SPOOL_PATH}")
+            elif spooled:
+                os.remove(LOG_SPOOL_PATH)
+        for run, count in runs:
+            tracing.add(run, "checks_logs insert", started, time.time(), lane="checks_logs", rows=count, batch=len(taken), ok=ok)
+        return ok
+
+
+@atexit.register
+def _shutdown():
+    if _buffer and _state["pid"] == os.getpid():
+        flush()
@@ -0,0 +1,72 @@
+import logging
+import os
+from datetime import date, datetime, time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Calendario de mercado por tipo de sesión (letra de `sessions` en instancias).
+# Fuera de horario, fin de semana o feriado la sesión no se chequea.
+# Por defecto solo M y B, con la apertura que ya usaba check_sessions; P y R se chequean
+# a toda hora salvo que se les dé horario: MARKET_HOURS="P=09:00-18:00,R=09:00-18:00"
+DEFAULT_HOURS = "M=09:36-18:00,B=09:17-18:00"
+# Fechas cerradas para todos, o solo para un tipo: MARKET_HOLIDAYS="2026-12-25,B:2026-11-23"
+MARKET_TZ = os.getenv("MARKET_TZ", "America/Argentina/Buenos_Aires")
+MARKET_CALENDAR_ENABLED = os.getenv("MARKET_CALENDAR_ENABLED", "1") == "1"
+
+
+def _parse_time(value):
+    hours, minutes = value.strip().split(":")
+    return time(int(hours), int(minutes))
+
+
+def _parse_hours(raw):
+    hours = {}
+    for item in raw.split(","):
+        if "=" in item:
+            code, window = item.split("=", 1)
+            opens, closes = window.split("-", 1)
+            hours[code.strip()] = (_parse_time(opens), _parse_time(closes))
+    return hours
+
+
+def _parse_holidays(raw):
+    # tipo -> fechas; None son los feriados de todos los mercados
+    holidays = {}
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        code, _, day = item.rpartition(":")
+        holidays.setdefault(code or None, set()).add(date.fromisoformat(day))
+    return holidays
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name)
+    except ZoneInfoNotFoundError:
+        logger.warning(f"Zona horaria '{name}' no disponible: se usa la hora local")
+        return None
+
+
+HOURS = {**_parse_hours(DEFAULT_HOURS), **_parse_hours(os.getenv("MARKET_HOURS", ""))}
+HOLIDAYS = _parse_holidays(os.getenv("MARKET_HOLIDAYS", ""))
+ZONE = _zone(MARKET_TZ)
+
+
+def now():
+    return datetime.now(ZONE)
+
+
+def is_open(code, at=None):
+    # Tipos sin calendario se chequean siempre
+    if not MARKET_CALENDAR_ENABLED or code not in HOURS:
+        return True
+    at = at or now()
+    if at.weekday() >= 5:
+        return False
+    if at.date() in HOLIDAYS.get(None, ()) or at.date() in HOLIDAYS.get(code, ()):
+        return False
+    opens, closes = HOURS[code]
+    return opens <= at.time() < closes
@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import os
+import threading
+import aiohttp
+
+# Métricas de los probes en formato de exposición de Prometheus (ver /metrics en main.py)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+_DEFINITIONS = {
+    "checks_probe_phase_seconds": ("histogram", "Duración de cada fase del request (dns, connect con TLS, ttfb, total)"),
+    "checks_probe_requests_total": ("counter", "Requests de los probes por resultado"),
+    "checks_probe_retries_total": ("counter", "Reintentos hechos por los probes"),
+    "checks_probe_results_total": ("counter", "Filas producidas por los probes por resultado"),
+}
+
+_lock = threading.Lock()
+# (nombre, labels) -> [buckets..., suma, cantidad] para histogramas, o valor para contadores
+_series = {}
+
+# Chequeo e instancia del probe en curso; lo fija el planner en la tarea de cada probe
+_probe = contextvars.ContextVar("checks_probe", default=None)
+
+
+def bind(check_name, instance):
+    _probe.set({"check": check_name, "instance": instance, "attempts": 0, "response_time": None})
+
+
+def _labels(**extra):
+    probe = _probe.get()
+    labels = {"check": probe["check"], "instance": probe["instance"]} if probe else {"check": "", "instance": ""}
+    labels.update(extra)
+    return tuple(sorted(labels.items()))
+
+
+def observe(name, seconds, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = (name, _labels(**labels))
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = [0] * (len(METRICS_BUCKETS) + 2)
+        for i, bound in enumerate(METRICS_BUCKETS):
+            if seconds <= bound:
+                series[i] += 1
+        series[-2] += seconds
+        series[-1] += 1
+
+
+def inc(name, amount=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = (name, _labels(**labels))
+    with _lock:
+        _series[key] = _series.get(key, 0) + amount
+
+
+def attempt():
+    probe = _probe.get()
+    if probe is not None:
+        probe["attempts"] += 1
+
+
+def responded(seconds):
+    # Duración del último intento que llegó a la red (sin cola del governor ni backoff)
+    probe = _probe.get()
+    if probe is not None:
+        probe["response_time"] = seconds
+
+
+def response_time():
+    probe = _probe.get()
+    return probe["response_time"] if probe is not None else None
+
+
+def probe_done(outcome):
+    # Cierra el probe: reintentos (intentos - 1) y resultado de la fila
+    probe = _probe.get()
+    if probe is not None and probe["attempts"] > 1:
+        inc("checks_probe_retries_total", probe["attempts"] - 1)
+    inc("checks_probe_results_total", outcome=outcome)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(labels):
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+
+
+def render():
+    with _lock:
+        items = sorted((key, list(value) if isinstance(value, list) else value) for key, value in _series.items())
+
+    lines = []
+    described = set()
+    for (name, labels), value in items:
+        if name not in described:
+            kind, text = _DEFINITIONS[name]
+            lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+            described.add(name)
+        if isinstance(value, list):
+            for bound, count in zip(METRICS_BUCKETS, value):
+                lines.append(f'{name}_bucket{{{_format(labels + (("le", bound),))}}} {count}')
+            lines.append(f'{name}_bucket{{{_format(labels + (("le", "+Inf"),))}}} {value[-1]}')
+            lines.append(f"{name}_sum{{{_format(labels)}}} {value[-2]}")
+            lines.append(f"{name}_count{{{_format(labels)}}} {value[-1]}")
+        else:
+            lines.append(f"{name}{{{_format(labels)}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Hooks de aiohttp: aiohttp no separa TCP de TLS, "connect" incluye el handshake ---
+def _now():
+    return asyncio.get_running_loop().time()
+
+
+async def _on_dns_start(session, ctx, params):
+    ctx.dns_start = _now()
+
+
+async def _on_dns_end(session, ctx, params):
+    observe("checks_probe_phase_seconds", _now() - ctx.dns_start, phase="dns")
+
+
+async def _on_connection_start(session, ctx, params):
+    ctx.connect_start = _now()
+
+
+async def _on_connection_end(session, ctx, params):
+    observe("checks_probe_phase_seconds", _now() - ctx.connect_start, phase="connect")
+
+
+async def _on_headers_sent(session, ctx, params):
+    ctx.sent_at = _now()
+
+
+async def _on_request_end(session, ctx, params):
+    # Llegaron los headers de la respuesta: tiempo hasta el primer byte
+    if hasattr(ctx, "sent_at"):
+        observe("checks_probe_phase_seconds", _now() - ctx.sent_at, phase="ttfb")
+
+
+def trace_config():
+    config = aiohttp.TraceConfig()
+    config.on_dns_resolvehost_start.append(_on_dns_start)
+    config.on_dns_resolvehost_end.append(_on_dns_end)
+    config.on_connection_create_start.append(_on_connection_start)
+    config.on_connection_create_end.append(_on_connection_end)
+    config.on_request_headers_sent.append(_on_headers_sent)
+    config.on_request_end.append(_on_request_end)
+    return config
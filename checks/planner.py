@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import math
+from dataclasses import dataclass
+from datetime import datetime
+import checks.deadline as deadline
+import checks.history as history
+import checks.latency as latency
+import checks.latest as latest
+import checks.metrics as metrics
+import checks.tracing as tracing
+
+logger = logging.getLogger(__name__)
+
+# Pares (chequeo, instancia) cuyos perfiles ya se buscaron en el historial local
+_seeded = set()
+
+
+class PlanError(Exception):
+    # Falta configuración para armar los probes de un chequeo
+    pass
+
+
+@dataclass
+class Probe:
+    check_name: str
+    instance: str
+    urls: tuple           # URLs que consulta; vacío si la fila se resuelve sin ir a la red
+    run: object           # función sin argumentos que devuelve la corrutina de la fila de log
+    variant: tuple = ()   # lo que además de las URLs cambia el resultado (token, sesiones)
+
+    @property
+    def key(self):
+        # Probes con la misma clave se resuelven con un solo request
+        if not self.urls:
+            return None
+        return (self.check_name, self.urls, self.variant)
+
+
+def resolved(row):
+    # Fila que se informa sin chequear (p. ej. instancias sin Matriz)
+    async def run():
+        return row
+    return Probe(row["check_name"], row["instance"], (), run)
+
+
+def expected(probe):
+    # Lo que históricamente tardó su URL más lenta; sin historia se asume lo peor
+    worst = 0.0
+    for url in probe.urls:
+        stats = latency.profile(url)
+        if stats is None:
+            return math.inf
+        worst = max(worst, stats["p95"])
+    return worst
+
+
+def order(probes):
+    # Los más lentos primero: toman cupo del governor antes y no quedan al final de la cola
+    return sorted(probes, key=expected, reverse=True)
+
+
+def pending_row(probe):
+    return {
+        "check_name": probe.check_name,
+        "instance": probe.instance,
+        "date": datetime.now().isoformat(),
+        "output": deadline.PENDING,
+        "error": 0
+    }
+
+
+def _fan_out(row, group):
+    if row is None:
+        return []
+    return [row] + [dict(row, instance=probe.instance) for probe in group[1:]]
+
+
+def _outcome(row):
+    if row["output"] == deadline.PENDING:
+        return "pending"
+    return "error" if row["error"] else "ok"
+
+
+async def _seed(probes):
+    # Los perfiles de latencia viven en memoria: tras un reinicio, el primer timeout de cada
+    # instancia sale de su historial local en lugar del timeout en frío del chequeo
+    urls = {}
+    for probe in probes:
+        pair = (probe.check_name, probe.instance)
+        if probe.urls and pair not in _seeded:
+            urls.setdefault(pair, set()).update(probe.urls)
+    if not urls or not history.HISTORY_ENABLED:
+        return
+    _seeded.update(urls)
+    try:
+        seeds = await asyncio.to_thread(history.latency_p99, urls)
+    except Exception as e:
+        logger.error(f"No se pudieron leer latencias del historial local: {e}")
+        return
+    for pair, p99 in seeds.items():
+        for url in urls[pair]:
+            latency.seed(url, p99)
+
+
+async def _run_group(group):
+    # Cada probe corre en su propia tarea: las métricas se etiquetan con su chequeo e instancia
+    metrics.bind(group[0].check_name, group[0].instance)
+    tracing.set_lane(f"{group[0].check_name} / {group[0].instance}")
+    try:
+        with tracing.span(group[0].check_name, instance=group[0].instance, duplicates=len(group) - 1):
+            row = await group[0].run()
+    except Exception as e:
+        logger.error(f"Error en el probe de '{group[0].instance}' ({group[0].check_name}): {e}")
+        row = {
+            "check_name": group[0].check_name,
+            "instance": group[0].instance,
+            "date": datetime.now().isoformat(),
+            "output": f"Error inesperado: {e}",
+            "error": 1
+        }
+    if row is not None:
+        metrics.probe_done(_outcome(row))
+    rows = _fan_out(row, group)
+    for row in rows:
+        latest.publish(row)
+    # Latencia del último intento, no el tiempo del grupo (cola, reintentos, backoff, HEAD+GET)
+    history.add(rows, metrics.response_time())
+    return rows
+
+
+async def execute(probes, timeout=None):
+    # Una sola tanda para todos los probes: deduplicados, los más lentos arrancan primero
+    # y cada fila se publica apenas termina. Lo que no termina en `timeout` queda pendiente.
+    loop = asyncio.get_running_loop()
+    limit = None if timeout is None else loop.time() + timeout
+    await _seed(probes)
+    groups = {}
+    for probe in probes:
+        groups.setdefault(probe.key or id(probe), []).append(probe)
+
+    leaders = order([group[0] for group in groups.values()])
+    tasks = {}
+    for leader in leaders:
+        group = groups[leader.key or id(leader)]
+        tasks[asyncio.ensure_future(_run_group(group))] = group
+
+    if not tasks:
+        return []
+    _, pending = await asyncio.wait(tasks, timeout=None if limit is None else max(0, limit - loop.time()))
+
+    rows = []
+    for task, group in tasks.items():
+        if task in pending:
+            task.cancel()
+            group_rows = _fan_out(pending_row(group[0]), group)
+            for row in group_rows:
+                latest.publish(row)
+            history.add(group_rows)
+        else:
+            group_rows = task.result()
+        rows += group_rows
+    return rows
+
+
+def summary(rows):
+    result = {"inserted_logs": len(rows), "status": "ok"}
+    pending = sum(1 for row in rows if row["output"] == deadline.PENDING)
+    if pending:
+        result["pending"] = pending
+    return result
+
+
+async def run(plan):
+    # Lo que hace el run_check de cada chequeo: armar los probes, correrlos y guardar
+    try:
+        with tracing.span("plan"):
+            probes = await plan()
+    except PlanError as e:
+        return {"error": str(e)}, 500
+
+    rows = await execute(probes)
+    latest.record(rows)
+    return summary(rows)
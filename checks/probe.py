@@ -0,0 +1,157 @@
+import asyncio
+import contextlib
+import os
+import time
+from urllib.parse import urlsplit
+import aiohttp
+import checks.breaker as breaker
+import checks.governor as governor
+import checks.latency as latency
+import checks.metrics as metrics
+import checks.tracing as tracing
+
+# Tope de bytes que se leen de un cuerpo de respuesta; lo que sobra no se lee
+BODY_MAX_BYTES = int(os.getenv("BODY_MAX_BYTES", str(256 * 1024)))
+BODY_CHUNK_SIZE = 8192
+# Tope para abrir la conexión, aparte del timeout total: un host que no acepta conexiones
+# (blackhole) falla rápido y cuenta para el circuit breaker. Nunca más de la mitad del total
+PROBE_CONNECT_TIMEOUT = float(os.getenv("PROBE_CONNECT_TIMEOUT", "10"))
+
+
+def _with_connect_timeout(timeout):
+    if timeout is None:
+        return aiohttp.ClientTimeout(sock_connect=PROBE_CONNECT_TIMEOUT)
+    if not isinstance(timeout, aiohttp.ClientTimeout):
+        timeout = aiohttp.ClientTimeout(total=timeout)
+    if timeout.sock_connect is not None:
+        return timeout
+    connect = PROBE_CONNECT_TIMEOUT if timeout.total is None else min(PROBE_CONNECT_TIMEOUT, timeout.total / 2)
+    return aiohttp.ClientTimeout(
+        total=timeout.total, connect=timeout.connect, sock_read=timeout.sock_read,
+        sock_connect=connect, ceil_threshold=timeout.ceil_threshold,
+    )
+
+
+# Hook de aiohttp (ver checks/http_client.py): marca el intento en cuanto tiene conexión,
+# nueva (TCP + TLS completos) o reusada del pool
+async def _on_connected(session, ctx, params):
+    if isinstance(ctx.trace_request_ctx, dict):
+        ctx.trace_request_ctx["connected"] = True
+
+
+def trace_config():
+    config = aiohttp.TraceConfig()
+    config.on_connection_create_end.append(_on_connected)
+    config.on_connection_reuseconn.append(_on_connected)
+    return config
+
+
+@contextlib.asynccontextmanager
+async def _queued(host, trial):
+    # Cupo del governor; si el probe de prueba del breaker no lo consigue, otro hará la prueba
+    acquired = False
+    try:
+        async with governor.slot(host):
+            acquired = True
+            yield
+    except BaseException:
+        if trial and not acquired:
+            breaker.release(host)
+        raise
+
+
+@contextlib.asynccontextmanager
+async def request(session, method, url, **kwargs):
+    # session.request con cupo del governor, circuit breaker por host y registro de latencia por URL
+    host = urlsplit(url).hostname
+    # Un HEAD tarda distinto que un GET: cada método lleva su propio perfil
+    key = url if method == "GET" else f"{method} {url}"
+    kwargs["timeout"] = _with_connect_timeout(kwargs.get("timeout"))
+    queued_at = time.time()
+    metrics.attempt()
+    # Antes de hacer cola: con el circuito abierto se falla en el acto, aunque los cupos
+    # del host estén tomados por probes colgados
+    try:
+        trial = breaker.before(host)
+    except breaker.CircuitOpenError:
+        metrics.inc("checks_probe_requests_total", outcome="circuit_open")
+        raise
+    async with _queued(host, trial):
+        outcome = "error"
+        started = time.monotonic()
+        started_at = time.time()
+        attempt = {"connected": False}
+        try:
+            with latency.measure(key, attempt):
+                async with session.request(method, url, trace_request_ctx=attempt, **kwargs) as response:
+                    outcome = f"{response.status // 100}xx"
+                    yield response
+        except asyncio.TimeoutError:
+            if not attempt["connected"]:
+                # No se pudo ni conectar (sea por sock_connect o por el total): falla del host
+                outcome = "connect_timeout"
+                breaker.failure(host)
+            else:
+                # Conectó pero tardó en responder: no dice que el host esté caído
+                outcome = "timeout"
+                breaker.release(host)
+            raise
+        except aiohttp.ClientConnectionError:
+            outcome = "connection_error"
+            breaker.failure(host)
+            raise
+        except Exception:
+            # El host respondió (HTTP de error, JSON inválido, etc.): está vivo
+            breaker.success(host)
+            raise
+        except BaseException:
+            outcome = "cancelled"
+            breaker.release(host)
+            raise
+        else:
+            breaker.success(host)
+        finally:
+            elapsed = time.monotonic() - started
+            metrics.observe("checks_probe_phase_seconds", elapsed, phase="total")
+            metrics.responded(elapsed)
+            metrics.inc("checks_probe_requests_total", outcome=outcome)
+            tracing.add(
+                tracing.current(), f"{method} {host}", started_at, time.time(),
+                url=url, outcome=outcome, queued=round(started_at - queued_at, 4),
+            )
+
+
+def get(session, url, **kwargs):
+    return request(session, "GET", url, **kwargs)
+
+
+def head(session, url, **kwargs):
+    return request(session, "HEAD", url, **kwargs)
+
+
+async def contains(response, marker, limit=None):
+    # Lee el cuerpo por chunks y corta apenas aparece el marcador o se llega al tope
+    limit = BODY_MAX_BYTES if limit is None else limit
+    marker = marker.encode()
+    tail = b""
+    read = 0
+    async for chunk in response.content.iter_chunked(BODY_CHUNK_SIZE):
+        # tail: el marcador puede quedar partido entre dos chunks
+        if marker in tail + chunk:
+            return True
+        read += len(chunk)
+        if read >= limit:
+            return False
+        tail = (tail + chunk)[-(len(marker) - 1):] if len(marker) > 1 else b""
+    return False
+
+
+async def discard(response, limit=None):
+    # Descarta el cuerpo sin acumularlo. Si se lee entero la conexión vuelve al pool;
+    # pasado el tope se deja de leer y aiohttp la cierra al salir del contexto
+    limit = BODY_MAX_BYTES if limit is None else limit
+    read = 0
+    async for chunk in response.content.iter_chunked(BODY_CHUNK_SIZE):
+        read += len(chunk)
+        if read >= limit:
+            return
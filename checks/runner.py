@@ -0,0 +1,116 @@
+import asyncio
+import os
+import time
+import checks.check_admin as check_admin
+import checks.check_nodes as check_nodes
+import checks.check_sessions as check_sessions
+import checks.check_matriz as check_matriz
+import checks.check_etrader as check_etrader
+import checks.check_webService as check_webService
+import checks.check_accountReport as check_accountReport
+import checks.latest as latest
+import checks.tracing as tracing
+
+CHECKS = {
+    "admin": check_admin,
+    "nodes": check_nodes,
+    "sessions": check_sessions,
+    "matriz": check_matriz,
+    "etrader": check_etrader,
+    "webService": check_webService,
+    "accountReport": check_accountReport,
+}
+
+# Segundos que se reutiliza el resultado de una corrida recién terminada
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "5"))
+
+_inflight = {}
+_last_results = {}
+_finished_at = {}
+_run_ids = {}
+
+
+def claim(key):
+    # Devuelve (future, propio). Si es propio, quien lo pidió corre el chequeo y lo
+    # resuelve con finish(); si no, se engancha a la corrida en curso o a la recién terminada
+    loop = asyncio.get_running_loop()
+    finished_at = _finished_at.get(key)
+    if finished_at is not None and time.monotonic() - finished_at < COALESCE_WINDOW:
+        future = loop.create_future()
+        future.set_result(_last_results[key])
+        return future, False
+
+    future = _inflight.get(key)
+    if future is not None:
+        return future, False
+
+    future = loop.create_future()
+    _inflight[key] = future
+    if key in CHECKS:
+        latest.begin(CHECKS[key].CHECK_NAME)
+
+    def release(_):
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+    future.add_done_callback(release)
+    return future, True
+
+
+def finish(key, future, result):
+    _last_results[key] = result
+    _finished_at[key] = time.monotonic()
+    run = tracing.current()
+    if run is not None:
+        _run_ids[key] = run["id"]
+    if not future.done():
+        future.set_result(result)
+
+
+def fail(future, error):
+    # Los enganchados reciben el mismo error (o la cancelación)
+    if future.done():
+        return
+    if isinstance(error, asyncio.CancelledError):
+        future.cancel()
+    else:
+        future.set_exception(error)
+
+
+async def _execute(key, future, fn):
+    run = tracing.start(key)
+    try:
+        finish(key, future, await fn())
+    except BaseException as e:
+        fail(future, e)
+        if not isinstance(e, Exception):
+            raise
+    finally:
+        tracing.finish(run)
+
+
+def attach(key, fn):
+    # Single-flight: quien llega mientras corre se engancha a la misma corrida.
+    # Devuelve (future, propio) sin esperar, para quien necesita saber si se enganchó
+    future, owner = claim(key)
+    if owner:
+        asyncio.ensure_future(_execute(key, future, fn))
+    return future, owner
+
+
+async def coalesce(key, fn):
+    future, _ = attach(key, fn)
+    # shield: si un llamador se cancela, la corrida compartida sigue
+    return await asyncio.shield(future)
+
+
+async def run(key):
+    return await coalesce(key, CHECKS[key].run_check)
+
+
+def last_result(key):
+    return _last_results.get(key)
+
+
+def last_run_id(key):
+    return _run_ids.get(key)
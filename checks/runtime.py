@@ -0,0 +1,79 @@
+import asyncio
+import atexit
+import os
+import threading
+import checks.http_client as http_client
+
+# Un único event loop de larga vida por worker, corriendo en su propio hilo
+_lock = threading.Lock()
+_state = {"loop": None, "pid": None}
+
+
+def get_loop():
+    with _lock:
+        # Tras un fork (gunicorn) el hilo del loop no existe en el hijo
+        if _state["loop"] is None or _state["pid"] != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="checks-loop", daemon=True).start()
+            _state["loop"] = loop
+            _state["pid"] = os.getpid()
+        return _state["loop"]
+
+
+def submit(coro):
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run(coro, timeout=None):
+    return submit(coro).result(timeout)
+
+
+_END = object()
+
+
+async def _next(agen):
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return _END
+
+
+def iterate(agen):
+    # Recorre un async generator del loop desde un hilo sincrónico (vistas de Flask)
+    try:
+        while True:
+            item = run(_next(agen))
+            if item is _END:
+                return
+            yield item
+    finally:
+        submit(agen.aclose())
+
+
+async def call(coro):
+    # Desde otro event loop (main_async.py): espera al loop de los chequeos sin bloquear el propio
+    return await asyncio.wrap_future(submit(coro))
+
+
+async def aiterate(agen):
+    # Como iterate(), para consumir el async generator desde otro event loop
+    try:
+        while True:
+            item = await call(_next(agen))
+            if item is _END:
+                return
+            yield item
+    finally:
+        submit(agen.aclose())
+
+
+@atexit.register
+def _shutdown():
+    loop = _state["loop"]
+    if loop is None or _state["pid"] != os.getpid() or not loop.is_running():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(http_client.close_session(), loop).result(5)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+import checks.check_disponibility as check_disponibility
+import checks.latest as latest
+import checks.liveness as liveness
+import checks.runner as runner
+import checks.runtime as runtime
+
+logger = logging.getLogger(__name__)
+
+# Nombre del job -> (función que corre el chequeo, check_name de las filas que produce)
+JOBS = {key: (module.run_check, [module.CHECK_NAME]) for key, module in runner.CHECKS.items()}
+JOBS["disponibility"] = (
+    check_disponibility.run_check,
+    [module.CHECK_NAME for module in runner.CHECKS.values()],
+)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULE_INTERVAL = float(os.getenv("SCHEDULE_INTERVAL", "300"))
+# Pasada esta edad la foto se sirve igual, pero se dispara una corrida en segundo plano
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", str(SCHEDULE_INTERVAL * 2)))
+
+
+def _parse_intervals(raw):
+    # SCHEDULE_INTERVALS="nodes=60,sessions=120"; 0 desactiva el job
+    intervals = {key: SCHEDULE_INTERVAL for key in runner.CHECKS}
+    # Los de plataforma casi siempre se resuelven con un HEAD: van más seguido
+    if liveness.LIVENESS_ENABLED:
+        for key in liveness.LIVENESS_CHECKS:
+            intervals[key] = liveness.LIVENESS_INTERVAL
+    # disponibility repite los siete chequeos: solo se agenda si se pide
+    intervals["disponibility"] = 0
+    for item in raw.split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            if key.strip() in JOBS:
+                intervals[key.strip()] = float(value)
+    return intervals
+
+
+INTERVALS = _parse_intervals(os.getenv("SCHEDULE_INTERVALS", ""))
+
+# Con el tier rápido estos chequeos corren cada minuto y casi siempre dan lo mismo:
+# a checks_logs van solo los cambios de estado y el latido, como con LOG_CHANGES_ONLY
+if liveness.LIVENESS_ENABLED:
+    for key in liveness.LIVENESS_CHECKS:
+        latest.log_changes_only(runner.CHECKS[key].CHECK_NAME)
+
+_started = {"pid": None}
+
+
+async def run(key):
+    return await runner.coalesce(key, JOBS[key][0])
+
+
+async def _run_every(key, interval):
+    while True:
+        try:
+            await run(key)
+        except Exception as e:
+            logger.error(f"Error en el job agendado '{key}': {e}")
+        await asyncio.sleep(interval)
+
+
+def start():
+    if _started["pid"] == os.getpid():
+        return
+    _started["pid"] = os.getpid()
+    for key, interval in INTERVALS.items():
+        if interval > 0:
+            runtime.submit(_run_every(key, interval))
+    logger.info(f"Scheduler iniciado: {INTERVALS}")
+
+
+async def serve(key, fresh=False):
+    check_names = JOBS[key][1]
+    rows, updated_at = latest.snapshot(check_names)
+
+    if fresh or updated_at is None:
+        await run(key)
+        rows, updated_at = latest.snapshot(check_names)
+        source, stale = "live", False
+    else:
+        source = "snapshot"
+        stale = time.time() - updated_at > SNAPSHOT_MAX_AGE
+        if stale:
+            # Si ya hay una corrida en curso, run() se engancha a ella
+            asyncio.ensure_future(run(key))
+
+    return {
+        "status": "ok",
+        "source": source,
+        "stale": stale,
+        "updated_at": datetime.fromtimestamp(updated_at).isoformat() if updated_at else None,
+        "last_run": runner.last_result(key),
+        "run_id": runner.last_run_id(key),
+        "results": rows,
+    }
+
+
+async def stream(key):
+    # Corre el chequeo (o se engancha a la corrida en curso) y entrega cada fila al terminar
+    check_names = set(JOBS[key][1])
+    queue = latest.subscribe()
+    try:
+        task, owner = runner.attach(key, JOBS[key][0])
+        if not owner:
+            # Corrida en curso o recién terminada: primero lo que ya publicó. Se suscribió
+            # antes de leerlo, así la cola solo trae lo posterior
+            for row in latest.published(check_names):
+                yield row
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
+            row = getter.result()
+            if row["check_name"] in check_names:
+                yield row
+
+        while not queue.empty():
+            row = queue.get_nowait()
+            if row["check_name"] in check_names:
+                yield row
+        # Si la corrida falló (p. ej. sin inventario) el cliente igual recibe un cierre
+        error = "Corrida cancelada" if task.cancelled() else task.exception()
+        if error is not None:
+            yield {"status": "error", "error": str(error), "run_id": runner.last_run_id(key)}
+        else:
+            yield {"status": "done", "last_run": task.result(), "run_id": runner.last_run_id(key)}
+    finally:
+        latest.unsubscribe(queue)
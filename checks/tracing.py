@@ -0,0 +1,122 @@
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Traza por corrida (waterfall): lecturas de configuración, intentos de cada probe,
+# esperas de backoff e inserción de logs. Se sirve en /runs/<id>/trace en formato
+# Chrome trace (chrome://tracing, Perfetto) y, si hay directorio, se escribe a disco.
+RUN_TRACE_KEEP = int(os.getenv("RUN_TRACE_KEEP", "50"))
+RUN_TRACE_DIR = os.getenv("RUN_TRACE_DIR", "")
+
+_lock = threading.Lock()
+_runs = OrderedDict()
+
+_current = contextvars.ContextVar("checks_run", default=None)
+# Carril del waterfall: cada probe va en el suyo
+_lane = contextvars.ContextVar("checks_lane", default="corrida")
+
+
+def start(name):
+    # Vale para la tarea actual y las que se creen desde ella
+    run = {"id": uuid.uuid4().hex[:12], "name": name, "started": time.time(), "finished": None, "spans": []}
+    with _lock:
+        _runs[run["id"]] = run
+        while len(_runs) > RUN_TRACE_KEEP:
+            _runs.popitem(last=False)
+    _current.set(run)
+    return run
+
+
+def finish(run):
+    run["finished"] = time.time()
+    _persist(run)
+
+
+def current():
+    return _current.get()
+
+
+def set_lane(name):
+    _lane.set(name)
+
+
+def add(run, name, started, ended, lane=None, **args):
+    if run is None:
+        return
+    with _lock:
+        run["spans"].append({
+            "name": name,
+            "lane": lane or _lane.get(),
+            "start": started,
+            "end": ended,
+            "args": args,
+        })
+    # Spans que llegan después del cierre (p. ej. la inserción en lote de logs)
+    if run["finished"] is not None:
+        _persist(run)
+
+
+@contextlib.contextmanager
+def span(name, **args):
+    # Los args se pueden completar dentro del bloque (p. ej. el resultado)
+    run = _current.get()
+    started = time.time()
+    try:
+        yield args
+    finally:
+        add(run, name, started, time.time(), **args)
+
+
+def get(run_id):
+    return _runs.get(run_id)
+
+
+def recent():
+    with _lock:
+        runs = list(_runs.values())
+    return [
+        {"id": run["id"], "name": run["name"], "started": run["started"], "finished": run["finished"], "spans": len(run["spans"])}
+        for run in reversed(runs)
+    ]
+
+
+def chrome(run):
+    # Formato "Trace Event" de Chrome: un evento completo (ph=X) por span, tiempos en µs
+    with _lock:
+        spans = list(run["spans"])
+    end = run["finished"] or time.time()
+    lanes = {"corrida": 0}
+    events = [{
+        "name": run["name"], "cat": "run", "ph": "X", "pid": 1, "tid": 0,
+        "ts": run["started"] * 1e6, "dur": (end - run["started"]) * 1e6, "args": {"id": run["id"]},
+    }]
+    for item in sorted(spans, key=lambda s: s["start"]):
+        tid = lanes.setdefault(item["lane"], len(lanes))
+        events.append({
+            "name": item["name"], "cat": "probe" if tid else "run", "ph": "X", "pid": 1, "tid": tid,
+            "ts": item["start"] * 1e6, "dur": (item["end"] - item["start"]) * 1e6, "args": item["args"],
+        })
+    events += [
+        {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": lane}}
+        for lane, tid in lanes.items()
+    ]
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"run_id": run["id"], "name": run["name"]}}
+
+
+def _persist(run):
+    if not RUN_TRACE_DIR:
+        return
+    try:
+        os.makedirs(RUN_TRACE_DIR, exist_ok=True)
+        with open(os.path.join(RUN_TRACE_DIR, f"{run['id']}.json"), "w", encoding="utf-8") as f:
+            json.dump(chrome(run), f, default=str)
+    except OSError as e:
+        logger.error(f"No se pudo escribir la traza {run['id']}: {e}")
@@ -1,39 +1,74 @@
-from flask import Flask, redirect, url_for, session, request, jsonify
+from flask import Flask, Response, abort, redirect, url_for, session, request, jsonify
 from flask_session import Session
 from oauthlib.oauth2 import WebApplicationClient
 import requests
 import json
+from http.cookiejar import DefaultCookiePolicy
 import os
-import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
 from functools import wraps
 
 # --- Chequeos ---
-import checks.check_admin as check_admin
-import checks.check_nodes as check_nodes
-import checks.check_sessions as check_sessions
-import checks.check_matriz as check_matriz
-import checks.check_etrader as check_etrader
-import checks.check_webService as check_webService
-import checks.check_accountReport as check_accountReport
-import checks.check_disponibility as check_disponibility
+import checks.history as history
+import checks.inventory as inventory
+import checks.metrics as metrics
+import checks.runtime as runtime
+import checks.scheduler as scheduler
+import checks.tracing as tracing
 
 # --- Configuración OAuth & Flask ---
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+# El discovery se cachea; al vencer se revalida con ETag. Si Google falla o tarda se sigue
+# con el anterior y se reintenta a los GOOGLE_DISCOVERY_RETRY segundos
+GOOGLE_DISCOVERY_TTL = float(os.getenv("GOOGLE_DISCOVERY_TTL", "3600"))
+GOOGLE_DISCOVERY_RETRY = float(os.getenv("GOOGLE_DISCOVERY_RETRY", "60"))
+GOOGLE_HTTP_TIMEOUT = float(os.getenv("GOOGLE_HTTP_TIMEOUT", "5"))
 ALLOWED_DOMAINS = ["primary.com.ar"]  # <-- Reemplazá esto por tu dominio real
+# Prometheus no pasa por el login de Google: si está definido, /metrics pide este token.
+# Sin token, /metrics pide sesión como las demás rutas
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "clave-super-secreta")
 app.config['SESSION_TYPE'] = 'filesystem'
 Session(app)
 
-client = WebApplicationClient(GOOGLE_CLIENT_ID)
+# Sesión HTTP compartida para Google: discovery, token y userinfo reutilizan las conexiones.
+# La comparten todos los usuarios, así que no guarda cookies: nada de un login pasa al siguiente
+google_http = requests.Session()
+google_http.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+_discovery_lock = threading.Lock()
+_discovery = {"cfg": None, "etag": None, "expires_at": 0.0}
+
+# Los chequeos corren solos en segundo plano; las rutas sirven la última foto
+if scheduler.SCHEDULER_ENABLED:
+    scheduler.start()
 
 
 # --- Utilidades ---
 def get_google_provider_cfg():
-    return requests.get(GOOGLE_DISCOVERY_URL).json()
+    with _discovery_lock:
+        if time.monotonic() < _discovery["expires_at"]:
+            return _discovery["cfg"]
+
+        headers = {"If-None-Match": _discovery["etag"]} if _discovery["etag"] and _discovery["cfg"] else {}
+        try:
+            response = google_http.get(GOOGLE_DISCOVERY_URL, headers=headers, timeout=GOOGLE_HTTP_TIMEOUT)
+            if response.status_code != 304:
+                response.raise_for_status()
+                _discovery["cfg"] = response.json()
+                _discovery["etag"] = response.headers.get("ETag")
+            _discovery["expires_at"] = time.monotonic() + GOOGLE_DISCOVERY_TTL
+        except (requests.RequestException, ValueError) as e:
+            if _discovery["cfg"] is None:
+                raise
+            app.logger.warning(f"Discovery de Google no disponible, se usa el cacheado: {e}")
+            _discovery["expires_at"] = time.monotonic() + GOOGLE_DISCOVERY_RETRY
+        return _discovery["cfg"]
 
 
 def login_required(f):
@@ -45,12 +80,33 @@ def login_required(f):
     return decorated_function
 
 
+def serve_check(key):
+    # ?fresh=1 fuerza una corrida en vivo en lugar de devolver la última foto
+    fresh = request.args.get("fresh") == "1"
+    return jsonify(runtime.run(scheduler.serve(key, fresh)))
+
+
+def stream_check(key):
+    # NDJSON por defecto; SSE con ?format=sse o Accept: text/event-stream
+    sse = request.args.get("format") == "sse" or "text/event-stream" in request.headers.get("Accept", "")
+
+    def generate():
+        for item in runtime.iterate(scheduler.stream(key)):
+            line = json.dumps(item, default=str)
+            yield f"data: {line}\n\n" if sse else line + "\n"
+
+    mimetype = "text/event-stream" if sse else "application/x-ndjson"
+    return Response(generate(), mimetype=mimetype, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 # --- Rutas Auth ---
 @app.route("/login")
 def login():
     google_provider_cfg = get_google_provider_cfg()
     authorization_endpoint = google_provider_cfg["authorization_endpoint"]
 
+    # Un cliente OAuth por request: guarda el access token y los requests pueden ser concurrentes
+    client = WebApplicationClient(GOOGLE_CLIENT_ID)
     request_uri = client.prepare_request_uri(
         authorization_endpoint,
         redirect_uri=request.base_url.replace("/login", "") + "/auth/callback",
@@ -65,23 +121,25 @@ def callback():
     google_provider_cfg = get_google_provider_cfg()
     token_endpoint = google_provider_cfg["token_endpoint"]
 
+    client = WebApplicationClient(GOOGLE_CLIENT_ID)
     token_url, headers, body = client.prepare_token_request(
         token_endpoint,
         authorization_response=request.url,
         redirect_url=request.base_url,
         code=code,
     )
-    token_response = requests.post(
+    token_response = google_http.post(
         token_url,
         headers=headers,
         data=body,
         auth=(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET),
+        timeout=GOOGLE_HTTP_TIMEOUT,
     )
 
     client.parse_request_body_response(json.dumps(token_response.json()))
     userinfo_endpoint = google_provider_cfg["userinfo_endpoint"]
     uri, headers, body = client.add_token(userinfo_endpoint)
-    userinfo_response = requests.get(uri, headers=headers, data=body)
+    userinfo_response = google_http.get(uri, headers=headers, data=body, timeout=GOOGLE_HTTP_TIMEOUT)
 
     if userinfo_response.status_code != 200:
         return "Error al obtener información del usuario", 400
@@ -115,75 +173,116 @@ def home():
 @app.route("/check-admin")
 @login_required
 def trigger_check_admin():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(check_admin.run_check())
-    return jsonify(result)
+    return serve_check("admin")
 
 
 @app.route("/check-nodes")
 @login_required
 def trigger_check_nodes():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(check_nodes.run_check())
-    return jsonify(result)
+    return serve_check("nodes")
 
 
 @app.route("/check-sessions")
 @login_required
 def trigger_check_sessions():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(check_sessions.run_check())
-    return jsonify(result)
+    return serve_check("sessions")
 
 
 @app.route("/check-matriz")
 @login_required
 def trigger_check_matriz():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(check_matriz.run_check())
-    return jsonify(result)
+    return serve_check("matriz")
 
 
 @app.route("/check-etrader")
 @login_required
 def trigger_check_etrader():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(check_etrader.run_check())
-    return jsonify(result)
+    return serve_check("etrader")
 
 
 @app.route("/check-webService")
 @login_required
 def trigger_check_webService():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(check_webService.run_check())
-    return jsonify(result)
+    return serve_check("webService")
 
 
 @app.route("/check-accountReport")
 @login_required
 def trigger_check_accountReport():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(check_accountReport.run_check())
-    return jsonify(result)
+    return serve_check("accountReport")
 
 
 @app.route("/check-disponibility")
 @login_required
 def trigger_check_disponibility():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(check_disponibility.run_check())
+    return serve_check("disponibility")
+
+
+@app.route("/check-<key>/stream")
+@login_required
+def trigger_check_stream(key):
+    if key not in scheduler.JOBS:
+        abort(404)
+    return stream_check(key)
+
+
+@app.route("/refresh-inventory")
+@login_required
+def trigger_refresh_inventory():
+    inventory.invalidate()
+    return jsonify({"status": "ok"})
+
+
+@app.route("/availability")
+@login_required
+def trigger_availability():
+    # ?check=matriz&instance=X&days=7, o from/to en ISO; resolution=minute|hour|day opcional
+    if not history.HISTORY_ENABLED:
+        return jsonify({"error": "Historial local deshabilitado"}), 404
+
+    check = request.args.get("check")
+    check_names = scheduler.JOBS[check][1] if check in scheduler.JOBS else ([check] if check else None)
+    try:
+        until = datetime.fromisoformat(request.args["to"]) if "to" in request.args else datetime.now()
+        since = (
+            datetime.fromisoformat(request.args["from"]) if "from" in request.args
+            else until - timedelta(days=float(request.args.get("days", "7")))
+        )
+        result = history.availability(
+            since.timestamp(), until.timestamp(), check_names,
+            request.args.get("instance"), request.args.get("resolution"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify(result)
 
 
+@app.route("/runs")
+@login_required
+def trigger_runs():
+    return jsonify(tracing.recent())
+
+
+@app.route("/runs/<run_id>/trace")
+@login_required
+def trigger_run_trace(run_id):
+    # Formato Chrome trace: se abre en chrome://tracing o ui.perfetto.dev
+    run = tracing.get(run_id)
+    if run is None:
+        abort(404)
+    return jsonify(tracing.chrome(run))
+
+
+@app.route("/metrics")
+def trigger_metrics():
+    if METRICS_TOKEN:
+        if request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+            abort(401)
+    elif "email" not in session:
+        return redirect(url_for("login"))
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 # --- Para ejecutar local si hiciera falta ---
 if __name__ == "__main__":
      app.run(host="0.0.0.0", port=8080, debug=True)
@@ -0,0 +1,134 @@
+# Modo de servicio async: un worker aiohttp atiende muchos requests a la vez en un proceso.
+#
+#   gunicorn -w 1 -k aiohttp.GunicornWebWorker -b 0.0.0.0:8080 main_async:app
+#
+# Las rutas de chequeos (/check-<key> y /check-<key>/stream) esperan al loop de los
+# chequeos (checks/runtime.py) sin ocupar un hilo. El resto (login, callback, /availability,
+# /metrics, ...) es la misma app Flask de main.py, servida vía WSGI en un pool de hilos,
+# así que login_required y las sesiones de Flask-Session no cambian.
+
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+from flask import session
+import main
+import checks.runtime as runtime
+import checks.scheduler as scheduler
+
+# Hilos para las rutas Flask (WSGI) y para leer la sesión de las rutas async
+ASYNC_WSGI_THREADS = int(os.getenv("ASYNC_WSGI_THREADS", "8"))
+_executor = ThreadPoolExecutor(max_workers=ASYNC_WSGI_THREADS, thread_name_prefix="wsgi")
+
+# Los arma aiohttp según el cuerpo que se entrega
+_SKIP_HEADERS = {"content-length", "transfer-encoding", "connection"}
+
+
+def _environ(request, body):
+    host, _, port = request.host.partition(":")
+    environ = {
+        "REQUEST_METHOD": request.method,
+        "SCRIPT_NAME": "",
+        # WSGI: el path ya decodificado, como bytes en latin-1
+        "PATH_INFO": request.path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": request.query_string,
+        "SERVER_NAME": host,
+        "SERVER_PORT": port or ("443" if request.secure else "80"),
+        "SERVER_PROTOCOL": f"HTTP/{request.version.major}.{request.version.minor}",
+        "REMOTE_ADDR": request.remote or "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": request.scheme,
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in request.headers.items():
+        key = name.upper().replace("-", "_")
+        if key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[key] = value
+            continue
+        key = f"HTTP_{key}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _call_wsgi(flask_app, environ):
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"], started["headers"] = status, headers
+
+    chunks = flask_app(environ, start_response)
+    try:
+        body = b"".join(chunks)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+    return started["status"], started["headers"], body
+
+
+def _logged_in(flask_app, environ):
+    # Mismo criterio que login_required; abrir la sesión lee el archivo de Flask-Session
+    with flask_app.request_context(environ):
+        return "email" in session
+
+
+async def _in_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+def build(flask_app, middlewares=()):
+    async def require_login(request):
+        if not await _in_thread(_logged_in, flask_app, _environ(request, b"")):
+            raise web.HTTPFound("/login")
+
+    async def serve_check(request):
+        key = request.match_info["key"]
+        await require_login(request)
+        # ?fresh=1 fuerza una corrida en vivo en lugar de devolver la última foto
+        fresh = request.query.get("fresh") == "1"
+        result = await runtime.call(scheduler.serve(key, fresh))
+        return web.Response(text=flask_app.json.dumps(result) + "\n", content_type="application/json")
+
+    async def stream_check(request):
+        key = request.match_info["key"]
+        if key not in scheduler.JOBS:
+            raise web.HTTPNotFound()
+        await require_login(request)
+        # NDJSON por defecto; SSE con ?format=sse o Accept: text/event-stream
+        sse = request.query.get("format") == "sse" or "text/event-stream" in request.headers.get("Accept", "")
+
+        response = web.StreamResponse(headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        response.content_type = "text/event-stream" if sse else "application/x-ndjson"
+        response.charset = "utf-8"
+        await response.prepare(request)
+        async for item in runtime.aiterate(scheduler.stream(key)):
+            line = json.dumps(item, default=str)
+            await response.write((f"data: {line}\n\n" if sse else line + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def wsgi(request):
+        body = await request.read()
+        status, headers, payload = await _in_thread(_call_wsgi, flask_app, _environ(request, body))
+        code, _, reason = status.partition(" ")
+        return web.Response(
+            status=int(code), reason=reason or None, body=payload,
+            headers=[(name, value) for name, value in headers if name.lower() not in _SKIP_HEADERS],
+        )
+
+    app = web.Application(middlewares=list(middlewares))
+    keys = "|".join(re.escape(key) for key in scheduler.JOBS)
+    app.router.add_get(f"/check-{{key:{keys}}}", serve_check)
+    app.router.add_get("/check-{key}/stream", stream_check)
+    app.router.add_route("*", "/{tail:.*}", wsgi)
+    return app
+
+
+app = build(main.app)